@@ -0,0 +1,179 @@
+import os
+from collections import OrderedDict
+from typing import Dict, Any, Tuple
+from datetime import datetime, timedelta, date
+from dotenv import load_dotenv
+from app.database import get_database
+
+load_dotenv()
+
+class PumpAnalyticsService:
+    """
+    Server-side pump runtime analytics.
+
+    Pump logs are paired in Mongo: $setWindowFields gives every event the
+    timestamp of the next one, so each "on" event yields an on-interval.
+    Intervals are split at UTC midnight and summed per day. Repeated "on"
+    events (e.g. from fleet scoring) extend the same cycle instead of
+    starting a new one.
+
+    Closed days never change, so their results are cached per
+    (device, day); only the still-open tail of a range is recomputed.
+    """
+    def __init__(self):
+        self.default_flow_rate_lpm = float(os.getenv("PUMP_FLOW_RATE_LPM", 10))
+        self.max_cached_days = int(os.getenv("ANALYTICS_CACHE_MAX_DAYS", 100000))
+        # Audit events are written asynchronously - give them time to land
+        self.close_grace = timedelta(minutes=5)
+        self._day_cache: "OrderedDict[Tuple[str, date], dict]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    async def get_runtime(self, device: dict, days: int) -> Dict[str, Any]:
+        """Daily runtime, cycle count and water use for the last N days"""
+        device_id = str(device["_id"])
+        flow_rate = float(device.get("pump_flow_rate_lpm") or self.default_flow_rate_lpm)
+
+        now = datetime.utcnow()
+        today = now.date()
+        requested = [today - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+
+        # Reuse cached closed days; recompute from the first gap onwards
+        results: Dict[date, dict] = {}
+        first_missing = None
+        for day in requested:
+            cached = self._day_cache.get((device_id, day))
+            if cached is not None:
+                self._day_cache.move_to_end((device_id, day))
+                self.cache_hits += 1
+                results[day] = cached
+            elif first_missing is None:
+                first_missing = day
+
+        if first_missing is not None:
+            window_start = datetime.combine(first_missing, datetime.min.time())
+            computed = await self._aggregate_days(device_id, window_start, now)
+            for day in requested:
+                if day < first_missing:
+                    continue
+                self.cache_misses += 1
+                results[day] = computed.get(day, {"runtime_seconds": 0.0, "cycles": 0})
+                day_end = datetime.combine(day + timedelta(days=1), datetime.min.time())
+                if day_end + self.close_grace <= now:
+                    self._store((device_id, day), results[day])
+
+        daily = []
+        for day in requested:
+            runtime_minutes = results[day]["runtime_seconds"] / 60
+            daily.append({
+                "date": day,
+                "runtime_minutes": round(runtime_minutes, 2),
+                "cycles": results[day]["cycles"],
+                "water_liters": round(runtime_minutes * flow_rate, 2)
+            })
+
+        return {
+            "device_id": device_id,
+            "flow_rate_lpm": flow_rate,
+            "total_runtime_minutes": round(sum(d["runtime_minutes"] for d in daily), 2),
+            "total_cycles": sum(d["cycles"] for d in daily),
+            "total_water_liters": round(sum(d["water_liters"] for d in daily), 2),
+            "days": daily
+        }
+
+    async def _aggregate_days(self, device_id: str, window_start: datetime,
+                              window_end: datetime) -> Dict[date, dict]:
+        """Pair consecutive pump events and sum on-time per UTC day"""
+        db = get_database()
+
+        # Include the last event before the window so a pump that was
+        # already running at window_start is counted
+        previous = await db.pump_logs.find_one(
+            {"device_id": device_id, "timestamp": {"$lt": window_start}},
+            {"timestamp": 1},
+            sort=[("timestamp", -1)]
+        )
+        match_start = previous["timestamp"] if previous else window_start
+
+        pipeline = [
+            {"$match": {
+                "device_id": device_id,
+                "timestamp": {"$gte": match_start, "$lt": window_end}
+            }},
+            {"$setWindowFields": {
+                "sortBy": {"timestamp": 1},
+                "output": {
+                    "next_timestamp": {"$shift": {"output": "$timestamp", "by": 1, "default": window_end}},
+                    "previous_status": {"$shift": {"output": "$pump_status", "by": -1, "default": "off"}}
+                }
+            }},
+            {"$match": {"pump_status": "on", "next_timestamp": {"$gt": window_start}}},
+            {"$project": {
+                "start": {"$max": ["$timestamp", window_start]},
+                "end": "$next_timestamp",
+                "new_cycle": {"$and": [
+                    {"$ne": ["$previous_status", "on"]},
+                    {"$gte": ["$timestamp", window_start]}
+                ]}
+            }},
+            {"$set": {"first_day": {"$dateTrunc": {"date": "$start", "unit": "day"}}}},
+            # Split each on-interval at midnight
+            {"$project": {
+                "new_cycle": 1,
+                "pieces": {"$map": {
+                    "input": {"$range": [0, {"$add": [
+                        {"$dateDiff": {"startDate": "$first_day", "endDate": "$end", "unit": "day"}}, 1
+                    ]}]},
+                    "as": "offset",
+                    "in": {"$let": {
+                        "vars": {"day": {"$dateAdd": {"startDate": "$first_day", "unit": "day", "amount": "$$offset"}}},
+                        "in": {
+                            "day": "$$day",
+                            "ms": {"$subtract": [
+                                {"$min": ["$end", {"$dateAdd": {"startDate": "$$day", "unit": "day", "amount": 1}}]},
+                                {"$max": ["$start", "$$day"]}
+                            ]}
+                        }
+                    }}
+                }}
+            }},
+            {"$unwind": {"path": "$pieces", "includeArrayIndex": "piece"}},
+            {"$group": {
+                "_id": "$pieces.day",
+                "runtime_ms": {"$sum": {"$max": ["$pieces.ms", 0]}},
+                "cycles": {"$sum": {"$cond": [
+                    {"$and": ["$new_cycle", {"$eq": ["$piece", 0]}]}, 1, 0
+                ]}}
+            }}
+        ]
+
+        rows = await db.pump_logs.aggregate(pipeline).to_list(length=None)
+        return {
+            row["_id"].date(): {
+                "runtime_seconds": row["runtime_ms"] / 1000,
+                "cycles": row["cycles"]
+            }
+            for row in rows
+        }
+
+    def _store(self, key: Tuple[str, date], value: dict):
+        self._day_cache[key] = value
+        self._day_cache.move_to_end(key)
+        while len(self._day_cache) > self.max_cached_days:
+            self._day_cache.popitem(last=False)
+
+    def invalidate_device(self, device_id: str):
+        """Drop cached days for a device (e.g. after its logs are deleted)"""
+        for key in [k for k in self._day_cache if k[0] == device_id]:
+            del self._day_cache[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache metrics"""
+        return {
+            "cached_days": len(self._day_cache),
+            "hits": self.cache_hits,
+            "misses": self.cache_misses
+        }
+
+# Global instance
+pump_analytics = PumpAnalyticsService()
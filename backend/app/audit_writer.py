@@ -0,0 +1,128 @@
+import asyncio
+import os
+import time
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Tuple
+from dotenv import load_dotenv
+from app.database import get_database
+
+load_dotenv()
+
+class AuditWriter:
+    """
+    Buffered asynchronous writer for pump logs and other audit events.
+
+    Request handlers only pay for an enqueue. A background task batches
+    events and writes them with one insert_many per collection whenever
+    the batch is full or the flush interval elapses. The queue is bounded:
+    when it is full new events are dropped and counted rather than
+    blocking the request. Remaining events are flushed on shutdown.
+    """
+    def __init__(self):
+        self.max_queue = int(os.getenv("AUDIT_QUEUE_SIZE", 10000))
+        self.batch_size = int(os.getenv("AUDIT_BATCH_SIZE", 500))
+        self.flush_interval = float(os.getenv("AUDIT_FLUSH_INTERVAL_SECONDS", 1.0))
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self._total_flush_seconds = 0.0
+
+    def start(self):
+        """Start the background flusher"""
+        if self._task is None:
+            self._stopping = False
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything still queued and stop the flusher"""
+        if self._task:
+            self._stopping = True
+            await self._task
+            self._task = None
+
+    def write(self, collection: str, document: dict) -> bool:
+        """Enqueue a document for insertion; returns False if it was dropped"""
+        if self._queue is None or self._stopping:
+            self.dropped += 1
+            return False
+        try:
+            self._queue.put_nowait((collection, document))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while not (self._stopping and self._queue.empty()):
+            try:
+                first = await asyncio.wait_for(self._queue.get(), self.flush_interval)
+            except asyncio.TimeoutError:
+                continue
+
+            batch = [first]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                timeout = deadline - loop.time()
+                if timeout <= 0 or self._stopping:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[str, dict]]):
+        """Write a batch with one insert_many per collection"""
+        by_collection: Dict[str, List[dict]] = defaultdict(list)
+        for collection, document in batch:
+            by_collection[collection].append(document)
+
+        started = time.perf_counter()
+        db = get_database()
+        for collection, documents in by_collection.items():
+            try:
+                await db[collection].insert_many(documents, ordered=False)
+                self.written += len(documents)
+            except Exception as e:
+                self.failed += len(documents)
+                print(f"❌ Audit flush to '{collection}' failed ({len(documents)} events): {e}")
+
+        elapsed = time.perf_counter() - started
+        self.flushes += 1
+        self.last_flush_seconds = elapsed
+        self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+        self._total_flush_seconds += elapsed
+
+    def stats(self) -> Dict[str, Any]:
+        """Writer metrics"""
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_capacity": self.max_queue,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "last_flush_seconds": round(self.last_flush_seconds, 4),
+            "max_flush_seconds": round(self.max_flush_seconds, 4),
+            "avg_flush_seconds": round(self._total_flush_seconds / self.flushes, 4) if self.flushes else None
+        }
+
+# Global instance
+audit_writer = AuditWriter()
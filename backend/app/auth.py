@@ -1,12 +1,17 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Dict, Any
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
+import multiprocessing
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.database import get_database
 from app.models import TokenData, User
+from app.cache import TTLCache
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -22,6 +27,89 @@ pwd_context = CryptContext(schemes=["sha256_crypt", "bcrypt"], deprecated="auto"
 
 # Bearer token scheme
 security = HTTPBearer()
+# Same scheme for endpoints that also accept other credentials
+optional_security = HTTPBearer(auto_error=False)
+
+# Authenticated-user cache: token -> User
+# A cached token skips both JWT verification and the users lookup
+user_cache = TTLCache(
+    max_entries=int(os.getenv("USER_CACHE_MAX_ENTRIES", 10000)),
+    ttl_seconds=float(os.getenv("USER_CACHE_TTL_SECONDS", 60))
+)
+
+class PasswordHasher:
+    """
+    Runs password hashing/verification in a dedicated, size-limited pool
+    so that the CPU-heavy sha256_crypt/bcrypt rounds never block the event
+    loop. Work beyond max_pending (running + queued) is rejected with 503
+    instead of piling up during login storms.
+    
+    A process pool is the default: passlib's os_crypt backend holds the
+    GIL for the whole sha256_crypt hash, so worker threads would still
+    stall the loop. Its workers are spawned, not forked - forking a process
+    that already runs Motor/pymongo and other background threads can
+    deadlock the children. (bcrypt releases the GIL; deployments with only
+    bcrypt hashes can use PASSWORD_HASH_EXECUTOR=thread.)
+    See benchmark_password_hashing.py for the loop-lag comparison.
+    """
+    def __init__(self):
+        self.workers = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+        self.max_pending = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 32))
+        self.executor_type = os.getenv("PASSWORD_HASH_EXECUTOR", "process").lower()
+        self._executor = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many authentication requests, please retry shortly",
+                headers={"Retry-After": "1"}
+            )
+        if self._executor is None:
+            # Created lazily so importing this module never spawns workers
+            if self.executor_type == "thread":
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="password-hash"
+                )
+            else:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "executor": self.executor_type,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected
+        }
+
+password_hasher = PasswordHasher()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
@@ -31,6 +119,14 @@ def get_password_hash(password: str) -> str:
     """Hash a password"""
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password off the event loop"""
+    return await password_hasher.verify(plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password off the event loop"""
+    return await password_hasher.hash(password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT access token"""
     to_encode = data.copy()
@@ -43,32 +139,41 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str) -> TokenData:
-    """Verify and decode a JWT token"""
+def _decode_token(token: str) -> dict:
+    """Verify a JWT token and return its payload"""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
+        if payload.get("sub") is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not validate credentials"
             )
-        return TokenData(email=email)
+        return payload
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials"
         )
 
+def verify_token(token: str) -> TokenData:
+    """Verify and decode a JWT token"""
+    return TokenData(email=_decode_token(token)["sub"])
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> User:
     """Get the current authenticated user"""
     token = credentials.credentials
-    token_data = verify_token(token)
+    
+    # Signature already verified and user already loaded within the TTL
+    cached_user = user_cache.get(token)
+    if cached_user is not None:
+        return cached_user
+    
+    payload = _decode_token(token)
     
     db = get_database()
-    user = await db.users.find_one({"email": token_data.email})
+    user = await db.users.find_one({"email": payload["sub"]})
     
     if user is None:
         raise HTTPException(
@@ -76,12 +181,26 @@ async def get_current_user(
             detail="User not found"
         )
     
-    return User(
+    current_user = User(
         id=str(user["_id"]),
         username=user["username"],
         email=user["email"],
         created_at=user["created_at"]
     )
+    
+    # Never cache a token beyond its own expiry (tokens without exp use the cache TTL)
+    expires = payload.get("exp")
+    ttl = user_cache.ttl_seconds if expires is None else min(user_cache.ttl_seconds, expires - time.time())
+    if ttl > 0:
+        user_cache.set(token, current_user, ttl)
+    else:
+        user_cache.pop(token)
+    
+    return current_user
+
+def invalidate_user(email: str):
+    """Drop cached sessions for a user after their document changes"""
+    user_cache.invalidate_where(lambda _, user: user.email == email)
 
 async def get_user_by_email(email: str):
     """Get user by email"""
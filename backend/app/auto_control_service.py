@@ -0,0 +1,207 @@
+import asyncio
+import os
+from typing import Dict, Any, Optional, Tuple
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from app.models import PredictionInput, PredictionResponse
+from app.ml_service import ml_service
+from app.rule_engine import device_overrides
+from app.weather_service import weather_service
+from app.pump_events import pump_event_broker
+from app.pump_state import pump_state
+from app.audit_writer import audit_writer
+from app.database import get_database
+
+load_dotenv()
+
+class AutoControlWorker:
+    """
+    Event-driven auto irrigation for devices with auto_mode enabled.
+
+    Each new sensor reading enqueues a decision for its device. Readings
+    that arrive within the debounce window are coalesced (the latest one
+    wins), so a burst of readings costs a single prediction. The pump only
+    switches when the decision changes, and switching is damped by:
+    - a hysteresis band on the same decision: the pump turns on when the
+      model says irrigate, and once on it stays on while the model would
+      still irrigate with soil moisture `band` points lower, i.e. until
+      moisture clears whichever threshold switched it on by the band
+      (rain stops it immediately)
+    - minimum on/off dwell times between switches, measured from the
+      stored state or, when there is none, from the last pump log
+    """
+    def __init__(self):
+        self.debounce_seconds = float(os.getenv("AUTO_CONTROL_DEBOUNCE_SECONDS", 10))
+        self.hysteresis_band = float(os.getenv("AUTO_CONTROL_HYSTERESIS_BAND", 5))
+        self.min_on_seconds = float(os.getenv("AUTO_CONTROL_MIN_ON_SECONDS", 300))
+        self.min_off_seconds = float(os.getenv("AUTO_CONTROL_MIN_OFF_SECONDS", 300))
+        # device_id -> (device, reading) waiting for evaluation
+        self._pending: Dict[str, Tuple[dict, dict]] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.counters = {
+            "enqueued": 0,
+            "coalesced": 0,
+            "evaluations": 0,
+            "switches": 0,
+            "held_by_hysteresis": 0,
+            "held_by_dwell": 0,
+            "errors": 0
+        }
+
+    def start(self):
+        """Start the background worker"""
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the background worker (pending decisions are dropped)"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._pending.clear()
+
+    def enqueue(self, device: dict, reading: dict):
+        """Schedule a decision for a device after the debounce window"""
+        if self._queue is None:
+            return
+        device_id = str(device["_id"])
+        self.counters["enqueued"] += 1
+        if device_id in self._pending:
+            # Already scheduled - just keep the newest reading
+            self._pending[device_id] = (device, reading)
+            self.counters["coalesced"] += 1
+            return
+        self._pending[device_id] = (device, reading)
+        asyncio.get_running_loop().call_later(
+            self.debounce_seconds, self._queue.put_nowait, device_id
+        )
+
+    def discard(self, device_id: str):
+        """Drop a scheduled decision (e.g. the device was deleted)"""
+        self._pending.pop(device_id, None)
+
+    async def _run(self):
+        while True:
+            device_id = await self._queue.get()
+            pending = self._pending.pop(device_id, None)
+            if pending is None:
+                continue
+            device, reading = pending
+            try:
+                await self.evaluate(device, reading)
+            except Exception as e:
+                self.counters["errors"] += 1
+                print(f"❌ Auto control failed for device {device_id}: {e}")
+
+    async def evaluate(self, device: dict, reading: dict):
+        """Predict, apply hysteresis/dwell, and switch the pump only on change"""
+        device_id = str(device["_id"])
+        self.counters["evaluations"] += 1
+
+        location = device.get("location", "London")
+        weather = await weather_service.get_current_weather(city=location)
+        rain_probability = weather_service.expected_rain_probability(location, weather.rain_probability)
+        prediction_input = PredictionInput(
+            soil_moisture=reading["soil_moisture"],
+            temperature=reading["temperature"],
+            humidity=reading["humidity"],
+            rain_sensor=reading["rain_sensor"],
+            rain_probability=rain_probability
+        )
+        prediction = ml_service.predict_irrigation(prediction_input, device_overrides(device))
+
+        current_status, since = await self._current(device_id)
+        desired = self._decide(current_status, prediction, prediction_input, device)
+
+        if desired == current_status:
+            return
+
+        now = datetime.utcnow()
+        if since is not None:
+            min_dwell = self.min_on_seconds if current_status == "on" else self.min_off_seconds
+            if now - since < timedelta(seconds=min_dwell):
+                self.counters["held_by_dwell"] += 1
+                return
+
+        await pump_state.set(device_id, {
+            "status": desired,
+            "mode": "auto",
+            "timestamp": now
+        })
+        pump_event_broker.publish_status(device_id, device.get("user_id"), desired, "auto", now)
+        self.counters["switches"] += 1
+
+        audit_writer.write("pump_logs", {
+            "device_id": device_id,
+            "pump_status": desired,
+            "reason": prediction.reason,
+            "ml_prediction": {
+                "predicted_class": prediction.predicted_class,
+                "recommendation": prediction.recommendation,
+                "confidence": prediction.confidence
+            },
+            "weather_data": {
+                "temperature": weather.temperature,
+                "humidity": weather.humidity,
+                "rain_probability": weather.rain_probability,
+                "expected_rain_probability": rain_probability,
+                "description": weather.description
+            },
+            "timestamp": now
+        })
+
+    async def _current(self, device_id: str) -> Tuple[str, Optional[datetime]]:
+        """
+        (status, changed_at) of the pump. Without stored state (expired,
+        evicted or a cold worker) the last pump log stands in for it, so
+        the dwell times still apply; a pump never switched reads (off, None).
+        """
+        current = await pump_state.get(device_id)
+        if current is not None:
+            return current["status"], current["changed_at"]
+        db = get_database()
+        last_log = await db.pump_logs.find_one(
+            {"device_id": device_id},
+            {"pump_status": 1, "timestamp": 1},
+            sort=[("timestamp", -1)]
+        )
+        if last_log is None:
+            return "off", None
+        return last_log["pump_status"], last_log["timestamp"]
+
+    def _decide(self, current_status: str, prediction: PredictionResponse,
+                prediction_input: PredictionInput, device: dict) -> str:
+        """Apply the hysteresis band to the model decision"""
+        if prediction.should_irrigate:
+            return "on"
+        if current_status == "off":
+            return "off"
+        # Rain (expected or detected) always stops irrigation
+        if prediction.predicted_class == 1:
+            return "off"
+        # Model says soil is fine - keep watering until it is fine by the band
+        # too, i.e. the same decision with soil moisture `band` points lower
+        drier = prediction_input.model_copy(update={
+            "soil_moisture": max(prediction_input.soil_moisture - self.hysteresis_band, 0.0)
+        })
+        if ml_service.predict_irrigation(drier, device_overrides(device)).should_irrigate:
+            self.counters["held_by_hysteresis"] += 1
+            return "on"
+        return "off"
+
+    def stats(self) -> Dict[str, Any]:
+        """Worker metrics"""
+        return {
+            "running": self._task is not None,
+            "pending": len(self._pending),
+            **self.counters
+        }
+
+# Global instance
+auto_control_worker = AutoControlWorker()
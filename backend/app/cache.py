@@ -0,0 +1,135 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+class TTLCache:
+    """
+    Bounded in-process cache with LRU eviction and per-entry expiry.
+
+    Expired entries are dropped lazily on read; when the cache is full the
+    least recently used entry is evicted. Hit/miss counters are kept for
+    the /metrics endpoint.
+    """
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a live entry (and mark it recently used) or default"""
+        item = self._entries.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+        expires_at, value = item
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        """Store an entry; ttl_seconds overrides the default TTL"""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Return a live entry without touching LRU order or counters"""
+        item = self._entries.get(key)
+        if item is None or time.monotonic() >= item[0]:
+            return default
+        return item[1]
+
+    def pop(self, key: Hashable):
+        """Remove a single entry if present"""
+        self._entries.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Remove all entries matching predicate(key, value); returns the count"""
+        stale = [key for key, (_, value) in self._entries.items() if predicate(key, value)]
+        for key in stale:
+            del self._entries[key]
+        return len(stale)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+
+class StaleWhileRevalidateCache(TTLCache):
+    """
+    TTLCache whose entries remain servable for stale_seconds after their
+    TTL. lookup() tells the caller whether a value is still fresh, so it
+    can serve a stale value immediately and refresh it in the background.
+    Entries older than TTL + stale_seconds are dropped as usual.
+    """
+    def __init__(self, max_entries: int, ttl_seconds: float, stale_seconds: float):
+        super().__init__(max_entries, ttl_seconds)
+        self.stale_seconds = stale_seconds
+        self.stale_hits = 0
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        super().set(key, (time.monotonic() + ttl, value), ttl + self.stale_seconds)
+
+    def lookup(self, key: Hashable) -> Tuple[Any, bool]:
+        """Return (value, is_fresh), or (None, False) on a miss"""
+        item = super().get(key)
+        if item is None:
+            return None, False
+        fresh_until, value = item
+        if time.monotonic() < fresh_until:
+            return value, True
+        self.stale_hits += 1
+        return value, False
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        value, _ = self.lookup(key)
+        return default if value is None else value
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        item = super().peek(key)
+        return default if item is None else item[1]
+
+    def is_fresh(self, key: Hashable) -> bool:
+        """Whether key holds a value that is still within its TTL"""
+        item = super().peek(key)
+        return item is not None and time.monotonic() < item[0]
+
+    def fresh_for(self, key: Hashable) -> float:
+        """Seconds until key's value goes stale (0 if missing or already stale)"""
+        item = super().peek(key)
+        return max(item[0] - time.monotonic(), 0.0) if item is not None else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **super().stats(),
+            "stale_seconds": self.stale_seconds,
+            "stale_hits": self.stale_hits
+        }
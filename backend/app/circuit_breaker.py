@@ -0,0 +1,95 @@
+import time
+from typing import Dict, Any
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for an external dependency.
+
+    closed:    requests flow; failure_threshold consecutive failures open it
+    open:      requests are refused until the reset timeout elapses
+    half_open: a single probe request is let through; success closes the
+               breaker, failure re-opens it with the timeout doubled (up to
+               max_reset_timeout). A probe that never reports back (e.g.
+               cancelled) is replaced after probe_timeout seconds.
+    trip() opens it immediately, for errors that retrying cannot fix
+    (e.g. an invalid or throttled API key).
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float, max_reset_timeout: float,
+                 probe_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.reset_timeout = reset_timeout
+        self.probe_timeout = probe_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._open_until = 0.0
+        self._probe_in_flight = False
+        self._probe_deadline = 0.0
+        self.opened = 0
+        self.short_circuited = 0
+
+    def allow_request(self) -> bool:
+        """Whether a call may go to the dependency now"""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() >= self._open_until:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.HALF_OPEN and (
+            not self._probe_in_flight or time.monotonic() >= self._probe_deadline
+        ):
+            self._probe_in_flight = True
+            self._probe_deadline = time.monotonic() + self.probe_timeout
+            return True
+        self.short_circuited += 1
+        return False
+
+    def release_probe(self):
+        """The request let through ended without an outcome (e.g. cancelled)"""
+        self._probe_in_flight = False
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            print(f"🔌 {self.name} circuit closed")
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.reset_timeout = self.base_reset_timeout
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN:
+            self.reset_timeout = min(self.reset_timeout * 2, self.max_reset_timeout)
+            self._open()
+        elif self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold:
+            self._open()
+
+    def trip(self):
+        """Open immediately"""
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN:
+            self.reset_timeout = min(self.reset_timeout * 2, self.max_reset_timeout)
+        if self.state != self.OPEN:
+            self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self._open_until = time.monotonic() + self.reset_timeout
+        self._probe_in_flight = False
+        self.opened += 1
+        print(f"🔌 {self.name} circuit opened for {self.reset_timeout:g}s after {self.consecutive_failures} failure(s)")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "reset_timeout_seconds": self.reset_timeout,
+            "opened": self.opened,
+            "short_circuited": self.short_circuited
+        }
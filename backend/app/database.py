@@ -25,7 +25,14 @@ async def connect_to_mongo():
         # Create indexes for better performance
         await database.sensor_readings.create_index([("device_id", 1), ("timestamp", -1)])
         await database.pump_logs.create_index([("device_id", 1), ("timestamp", -1)])
-        await database.devices.create_index([("user_id", 1)])
+        # Device listing: keyset pagination on _id per user, with filters
+        await database.devices.create_index([("user_id", 1), ("_id", 1), ("location", 1)])
+        # location_prefix filter: the anchored prefix bounds the location range
+        await database.devices.create_index([("user_id", 1), ("location", 1), ("_id", 1)])
+        await database.devices.create_index([("user_id", 1), ("is_active", 1), ("_id", 1)])
+        await database.devices.create_index([("user_id", 1), ("crop_type", 1), ("_id", 1)])
+        # Cross-worker device cache sync polls recent changes
+        await database.devices.create_index([("updated_at", 1)])
         await database.users.create_index([("email", 1)], unique=True)
         
     except Exception as e:
@@ -0,0 +1,151 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Set
+from fastapi import Depends, HTTPException, status
+from bson import ObjectId
+from dotenv import load_dotenv
+from app.auth import get_current_user
+from app.cache import TTLCache
+from app.database import get_database
+from app.models import User
+
+load_dotenv()
+
+# Devices being purged keep their document (marked deleted_at) until the
+# purge finishes; every device query excludes them
+NOT_DELETED = {"deleted_at": {"$exists": False}}
+
+class DeviceIndexCache:
+    """
+    Device lookups for ownership checks and list endpoints:
+    - device_id -> device document, loaded one device at a time
+    - user_id -> set of the user's device ids (ids only)
+
+    Replaces the per-request ownership find_one and the repeated
+    devices.find({"user_id": ...}) in list endpoints. Entries expire after
+    DEVICE_CACHE_TTL_SECONDS and are invalidated by every write in the
+    devices routes, so changes on the same worker are visible immediately.
+    Changes made on other workers are picked up by polling recently
+    updated (including soft-deleted) devices and purge jobs every
+    DEVICE_CACHE_SYNC_SECONDS.
+    """
+    def __init__(self):
+        ttl_seconds = float(os.getenv("DEVICE_CACHE_TTL_SECONDS", 30))
+        self._devices = TTLCache(
+            max_entries=int(os.getenv("DEVICE_CACHE_MAX_DEVICES", 50000)),
+            ttl_seconds=ttl_seconds
+        )
+        self._user_devices = TTLCache(
+            max_entries=int(os.getenv("DEVICE_CACHE_MAX_USERS", 10000)),
+            ttl_seconds=ttl_seconds
+        )
+        self.sync_interval = float(os.getenv("DEVICE_CACHE_SYNC_SECONDS", 5))
+        self._synced_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self.sync_invalidations = 0
+
+    async def get_user_device_ids(self, user_id: str) -> Set[str]:
+        """Ids of all devices of a user"""
+        device_ids = self._user_devices.get(user_id)
+        if device_ids is None:
+            db = get_database()
+            device_ids = {
+                str(device["_id"]) async for device in db.devices.find({"user_id": user_id, **NOT_DELETED}, {"_id": 1})
+            }
+            self._user_devices.set(user_id, device_ids)
+        return device_ids
+
+    async def get_owned(self, user_id: str, device_id: str) -> dict:
+        """Device document owned by user_id, or 404 (also for malformed ids)"""
+        device = None
+        if ObjectId.is_valid(device_id):
+            device = self._devices.get(device_id)
+            if device is None:
+                db = get_database()
+                device = await db.devices.find_one({"_id": ObjectId(device_id)})
+                if device is not None:
+                    self._devices.set(device_id, device)
+        if device is None or device["user_id"] != user_id or "deleted_at" in device:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Device not found"
+            )
+        return device
+
+    def invalidate(self, user_id: str, device_id: Optional[str] = None):
+        """Forget a user's device list (and one device) after a device write"""
+        self._user_devices.pop(user_id)
+        if device_id is not None:
+            self._devices.pop(device_id)
+
+    def invalidate_user(self, user_id: str):
+        """Forget a user's device list and every cached device of theirs (bulk writes)"""
+        self._user_devices.pop(user_id)
+        self._devices.invalidate_where(lambda _, device: device["user_id"] == user_id)
+
+    def start(self):
+        """Start polling for device changes made on other workers"""
+        if self.sync_interval > 0 and self._task is None:
+            self._synced_at = datetime.utcnow()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except Exception as e:
+                print(f"❌ Device cache sync failed: {e}")
+
+    async def sync(self):
+        """Invalidate devices updated or deleted since the last sync"""
+        db = get_database()
+        started = datetime.utcnow()
+        # Overlap one interval to tolerate clock skew between workers
+        since = self._synced_at - timedelta(seconds=self.sync_interval)
+        changed = [
+            (str(doc["_id"]), doc["user_id"]) async for doc in
+            db.devices.find({"updated_at": {"$gte": since}}, {"user_id": 1})
+        ]
+        changed += [
+            (doc["_id"], doc["user_id"]) async for doc in
+            db.device_purge_jobs.find({"created_at": {"$gte": since}}, {"user_id": 1})
+        ]
+        for device_id, user_id in changed:
+            cached = self._devices.peek(device_id)
+            if cached is not None:
+                # Also the previous owner, if the device changed hands
+                self._user_devices.pop(cached["user_id"])
+            self.invalidate(user_id, device_id)
+        self.sync_invalidations += len(changed)
+        self._synced_at = started
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "devices": self._devices.stats(),
+            "users": self._user_devices.stats(),
+            "sync_invalidations": self.sync_invalidations
+        }
+
+# Global instance
+device_index = DeviceIndexCache()
+
+async def get_owned_device(
+    device_id: str,
+    current_user: User = Depends(get_current_user)
+) -> dict:
+    """
+    Dependency resolving a device_id (path or query parameter) to the
+    current user's device document, raising 404 if it is not theirs
+    """
+    return await device_index.get_owned(current_user.id, device_id)
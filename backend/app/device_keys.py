@@ -0,0 +1,137 @@
+import asyncio
+import hashlib
+import os
+import secrets
+from typing import Dict, Any, Optional, Tuple
+from bson import ObjectId
+from dotenv import load_dotenv
+from app.database import get_database
+
+load_dotenv()
+
+# Device fields needed to ingest a reading without touching the database
+INDEX_PROJECTION = {
+    "user_id": 1,
+    "location": 1,
+    "crop_type": 1,
+    "moisture_threshold": 1,
+    "rule_thresholds": 1,
+    "auto_mode": 1,
+    "is_active": 1,
+    "api_key_hash": 1
+}
+
+class DeviceKeyIndex:
+    """
+    In-memory index of device-scoped API keys for sensor ingestion.
+
+    Only a SHA-256 hash of each key is stored on the device document
+    (keys are 256-bit random tokens, so a fast hash is sufficient). The
+    index maps key hash -> device summary, is loaded at startup, updated
+    in place by the devices routes, and periodically reloaded so other
+    workers pick up changes. A leaked key only grants ingestion for its
+    own device.
+    """
+    KEY_PREFIX = "dk_"
+
+    def __init__(self):
+        self.refresh_interval = int(os.getenv("DEVICE_KEY_REFRESH_SECONDS", 60))
+        self._by_hash: Dict[str, dict] = {}
+        self._hash_by_device: Dict[str, str] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.authenticated = 0
+        self.rejected = 0
+
+    @staticmethod
+    def hash_key(api_key: str) -> str:
+        return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def generate_key(cls) -> Tuple[str, str]:
+        """Create a new key; returns (plaintext, hash)"""
+        api_key = cls.KEY_PREFIX + secrets.token_urlsafe(32)
+        return api_key, cls.hash_key(api_key)
+
+    def authenticate(self, api_key: str, device_id: str) -> Optional[dict]:
+        """Resolve a key for device_id to its summary without any database reads"""
+        device = self._by_hash.get(self.hash_key(api_key))
+        if device is None or str(device["_id"]) != device_id or not device.get("is_active", True):
+            self.rejected += 1
+            return None
+        self.authenticated += 1
+        return device
+
+    def upsert(self, device: dict):
+        """Add or replace a device in the index (no-op if it has no key)"""
+        device_id = str(device["_id"])
+        self.remove(device_id)
+        key_hash = device.get("api_key_hash")
+        if key_hash:
+            self._by_hash[key_hash] = {k: v for k, v in device.items() if k != "api_key_hash"}
+            self._hash_by_device[device_id] = key_hash
+
+    def remove(self, device_id: str):
+        key_hash = self._hash_by_device.pop(device_id, None)
+        if key_hash:
+            self._by_hash.pop(key_hash, None)
+
+    async def refresh_device(self, device_id: str):
+        """Reload one device after it changes"""
+        db = get_database()
+        device = await db.devices.find_one({"_id": ObjectId(device_id)}, INDEX_PROJECTION)
+        if device is None:
+            self.remove(device_id)
+        else:
+            self.upsert(device)
+
+    async def refresh_user(self, user_id: str):
+        """Reload every keyed device of a user after a bulk change"""
+        db = get_database()
+        async for device in db.devices.find(
+            {"user_id": user_id, "api_key_hash": {"$exists": True}}, INDEX_PROJECTION
+        ):
+            self.upsert(device)
+
+    async def load(self):
+        """(Re)build the whole index from the devices collection"""
+        db = get_database()
+        by_hash: Dict[str, dict] = {}
+        hash_by_device: Dict[str, str] = {}
+        async for device in db.devices.find({"api_key_hash": {"$exists": True}}, INDEX_PROJECTION):
+            key_hash = device.pop("api_key_hash")
+            by_hash[key_hash] = device
+            hash_by_device[str(device["_id"])] = key_hash
+        self._by_hash = by_hash
+        self._hash_by_device = hash_by_device
+
+    def start(self):
+        """Start periodic reloads so changes made on other workers propagate"""
+        if self.refresh_interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.load()
+            except Exception as e:
+                print(f"❌ Device key index refresh failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "keys": len(self._by_hash),
+            "authenticated": self.authenticated,
+            "rejected": self.rejected
+        }
+
+# Global instance
+device_key_index = DeviceKeyIndex()
@@ -0,0 +1,262 @@
+import asyncio
+import time
+import os
+import uuid
+import numpy as np
+from typing import Dict, Any, Optional
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+from dotenv import load_dotenv
+from app.database import get_database
+from app.ml_service import ml_service
+from app.rule_engine import device_overrides
+from app.weather_service import weather_service
+from app.pump_events import pump_event_broker
+from app.pump_state import pump_state
+
+load_dotenv()
+
+class FleetScoringService:
+    """
+    Periodic fleet-wide auto control.
+
+    One cycle replaces N calls to POST /api/pump/auto:
+    1. One aggregation for the latest reading of every active device
+    2. One weather lookup per distinct device location
+    3. One vectorized ML prediction for the whole fleet
+    4. One bulk write for pump state and one for pump logs, covering only
+       the devices whose pump switches
+
+    Devices with auto_mode enabled are left to AutoControlWorker (which
+    applies hysteresis and dwell times per reading), and a pump the user
+    switched manually is never overridden.
+
+    Every worker runs the scheduler, but only the holder of the
+    fleet_scoring leader lease scores the fleet; the others take over
+    when the lease is not renewed.
+    """
+    LEASE_ID = "fleet_scoring"
+
+    def __init__(self):
+        # 0 disables the scheduler (cycles can still be run manually)
+        self.interval = int(os.getenv("FLEET_SCORING_INTERVAL_SECONDS", 0))
+        self.lease = timedelta(seconds=float(os.getenv("FLEET_LEADER_LEASE_SECONDS", max(self.interval * 3, 60))))
+        self.worker_id = uuid.uuid4().hex
+        self.is_leader = False
+        self._task: Optional[asyncio.Task] = None
+        self.cycles = 0
+        self.skipped_cycles = 0
+        self.failures = 0
+        self.last_cycle: Dict[str, Any] = {}
+
+    def start(self):
+        """Start the background scheduler if an interval is configured"""
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+            print(f"🔁 Fleet scoring scheduled every {self.interval}s")
+
+    async def stop(self):
+        """Cancel the background scheduler"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            await self._release_lease()
+
+    async def _acquire_lease(self) -> bool:
+        """Take or renew the leader lease; False while another worker holds it"""
+        db = get_database()
+        now = datetime.utcnow()
+        try:
+            await db.leader_leases.update_one(
+                {"_id": self.LEASE_ID, "$or": [{"holder": self.worker_id}, {"lease_until": {"$lte": now}}]},
+                {"$set": {"holder": self.worker_id, "lease_until": now + self.lease}},
+                upsert=True
+            )
+            leader = True
+        except DuplicateKeyError:
+            # The lease document exists and is held by a live worker
+            leader = False
+        if leader and not self.is_leader:
+            print(f"🔁 Fleet scoring leader: worker {self.worker_id}")
+        self.is_leader = leader
+        return leader
+
+    async def _release_lease(self):
+        """Let another worker take over right away on shutdown"""
+        if not self.is_leader:
+            return
+        self.is_leader = False
+        try:
+            db = get_database()
+            await db.leader_leases.update_one(
+                {"_id": self.LEASE_ID, "holder": self.worker_id},
+                {"$set": {"lease_until": datetime.utcnow()}}
+            )
+        except Exception as e:
+            print(f"⚠️ Could not release fleet scoring lease: {e}")
+
+    async def _run(self):
+        while True:
+            try:
+                if await self._acquire_lease():
+                    await self.run_cycle()
+                else:
+                    self.skipped_cycles += 1
+            except Exception as e:
+                self.failures += 1
+                print(f"❌ Fleet scoring cycle failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def run_cycle(self) -> Dict[str, Any]:
+        """Score every active device not under manual or per-reading control in a single pass"""
+        started = time.perf_counter()
+        db = get_database()
+
+        # Active devices (documents without is_active are treated as active),
+        # except those controlled per reading by AutoControlWorker
+        devices = await db.devices.find(
+            {"is_active": {"$ne": False}, "auto_mode": {"$ne": True}},
+            {"user_id": 1, "location": 1, "crop_type": 1, "rule_thresholds": 1}
+        ).to_list(length=None)
+        locations = {str(d["_id"]): d.get("location", "London") for d in devices}
+        owners = {str(d["_id"]): d.get("user_id") for d in devices}
+        # Rule threshold overrides: crop_type defaults + the device's own
+        thresholds = {str(d["_id"]): device_overrides(d) for d in devices}
+
+        # Latest reading per device in one aggregation
+        # ($sort + $group/$first on the (device_id, timestamp) index)
+        readings = await db.sensor_readings.aggregate([
+            {"$match": {"device_id": {"$in": list(locations)}}},
+            {"$sort": {"device_id": 1, "timestamp": -1}},
+            {"$group": {
+                "_id": "$device_id",
+                "soil_moisture": {"$first": "$soil_moisture"},
+                "temperature": {"$first": "$temperature"},
+                "humidity": {"$first": "$humidity"},
+                "rain_sensor": {"$first": "$rain_sensor"}
+            }}
+        ]).to_list(length=None)
+        # Pumps switched manually stay as the user left them
+        current = await pump_state.get_many(r["_id"] for r in readings)
+        manual = {device_id for device_id, state in current.items() if state["mode"] == "manual"}
+        readings = [r for r in readings if r["_id"] not in manual]
+        fetched = time.perf_counter()
+
+        # Weather once per distinct location (bounded concurrency, cache first)
+        weather_by_location = await weather_service.get_current_weather_many(
+            {locations[r["_id"]] for r in readings}
+        )
+        # Current rain probability raised by the cached forecast outlook
+        rain_by_location = {
+            loc: weather_service.expected_rain_probability(loc, weather.rain_probability)
+            for loc, weather in weather_by_location.items()
+        }
+        weather_done = time.perf_counter()
+
+        # One vectorized prediction for the whole fleet
+        features = np.array([
+            [
+                r["soil_moisture"],
+                r["temperature"],
+                r["humidity"],
+                r["rain_sensor"],
+                rain_by_location[locations[r["_id"]]]
+            ]
+            for r in readings
+        ], dtype=float).reshape(-1, 5)
+        predictions = ml_service.predict_irrigation_batch(
+            features,
+            thresholds=[thresholds[r["_id"]] for r in readings]
+        )
+        predicted = time.perf_counter()
+
+        # Apply decisions; state, logs and events only for devices that switch
+        now = datetime.utcnow()
+        log_docs = []
+        states = {}
+        pumps_on = 0
+        for reading, prediction in zip(readings, predictions):
+            device_id = reading["_id"]
+            pump_action = "on" if prediction.should_irrigate else "off"
+            pumps_on += pump_action == "on"
+            previous = current.get(device_id)
+            if previous is None:
+                # No state reads as "off"
+                if pump_action == "off":
+                    continue
+            elif previous["status"] == pump_action:
+                continue
+
+            weather = weather_by_location[locations[device_id]]
+            states[device_id] = {
+                "status": pump_action,
+                "mode": "auto",
+                "timestamp": now
+            }
+            pump_event_broker.publish_status(device_id, owners[device_id], pump_action, "auto", now)
+            log_docs.append({
+                "device_id": device_id,
+                "pump_status": pump_action,
+                "reason": prediction.reason,
+                "ml_prediction": {
+                    "predicted_class": prediction.predicted_class,
+                    "recommendation": prediction.recommendation,
+                    "confidence": prediction.confidence
+                },
+                "weather_data": {
+                    "temperature": weather.temperature,
+                    "humidity": weather.humidity,
+                    "rain_probability": weather.rain_probability,
+                    "expected_rain_probability": rain_by_location[locations[device_id]],
+                    "description": weather.description
+                },
+                "timestamp": now
+            })
+
+        await pump_state.set_many(states)
+        if log_docs:
+            await db.pump_logs.insert_many(log_docs, ordered=False)
+        finished = time.perf_counter()
+
+        self.cycles += 1
+        self.last_cycle = {
+            "finished_at": now,
+            "active_devices": len(locations),
+            "devices_scored": len(readings),
+            "devices_without_readings": len(locations) - len(readings) - len(manual),
+            "devices_manual": len(manual),
+            "locations": len(weather_by_location),
+            "pumps_on": pumps_on,
+            "switched": len(log_docs),
+            "duration_seconds": round(finished - started, 4),
+            "phase_seconds": {
+                "readings": round(fetched - started, 4),
+                "weather": round(weather_done - fetched, 4),
+                "prediction": round(predicted - weather_done, 4),
+                "writes": round(finished - predicted, 4)
+            }
+        }
+        print(
+            f"✅ Fleet scoring: {len(readings)} devices ({len(log_docs)} switched) in "
+            f"{self.last_cycle['duration_seconds']}s"
+        )
+        return self.last_cycle
+
+    def stats(self) -> Dict[str, Any]:
+        """Scheduler metrics (cycle time is tracked per cycle)"""
+        return {
+            "enabled": self.interval > 0,
+            "interval_seconds": self.interval,
+            "leader": self.is_leader,
+            "cycles": self.cycles,
+            "skipped_cycles": self.skipped_cycles,
+            "failures": self.failures,
+            "last_cycle": self.last_cycle
+        }
+
+# Global instance
+fleet_service = FleetScoringService()
@@ -0,0 +1,117 @@
+import unicodedata
+from typing import Tuple
+
+# Free-text city spellings -> canonical "city,cc" query understood by OpenWeather
+LOCATION_ALIASES = {
+    "pune": "pune,in",
+    "poona": "pune,in",
+    "mumbai": "mumbai,in",
+    "bombay": "mumbai,in",
+    "bengaluru": "bengaluru,in",
+    "bangalore": "bengaluru,in",
+    "chennai": "chennai,in",
+    "madras": "chennai,in",
+    "kolkata": "kolkata,in",
+    "calcutta": "kolkata,in",
+    "delhi": "delhi,in",
+    "new delhi": "new delhi,in",
+    "hyderabad": "hyderabad,in",
+    "nashik": "nashik,in",
+    "nasik": "nashik,in",
+    "nagpur": "nagpur,in",
+    "london": "london,gb",
+    "paris": "paris,fr",
+    "new york": "new york,us",
+    "nyc": "new york,us",
+}
+
+# Country names -> ISO 3166 alpha-2 codes
+COUNTRY_ALIASES = {
+    "india": "in",
+    "ind": "in",
+    "united kingdom": "gb",
+    "uk": "gb",
+    "england": "gb",
+    "united states": "us",
+    "usa": "us",
+    "france": "fr",
+    "china": "cn",
+    "japan": "jp",
+    "russia": "ru",
+}
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+def _fold(part: str) -> str:
+    """
+    Accent-folded, lower-cased query part. Parts with letters that have no
+    ASCII form ("Москва", "東京") are casefolded as typed, never dropped.
+    """
+    original = " ".join(part.split())
+    decomposed = unicodedata.normalize("NFKD", original)
+    if any(ord(ch) > 127 and not unicodedata.combining(ch) for ch in decomposed):
+        return original.casefold()
+    return decomposed.encode("ascii", "ignore").decode("ascii").lower()
+
+def normalize_city(city: str) -> str:
+    """
+    Canonical cache key for a city query: accents folded, lower case,
+    whitespace collapsed, country names mapped to codes and known
+    spellings resolved through LOCATION_ALIASES ("Pune, IN" -> "pune,in")
+    """
+    parts = [_fold(part) for part in city.split(",")]
+    parts = [part for part in parts if part]
+    if not parts:
+        return ""
+    if len(parts) > 1:
+        parts[-1] = COUNTRY_ALIASES.get(parts[-1], parts[-1])
+    key = ",".join(parts)
+    if key in LOCATION_ALIASES:
+        return LOCATION_ALIASES[key]
+    # "pune,in" style keys are canonical already; bare names go through the table
+    alias = LOCATION_ALIASES.get(parts[0])
+    if alias is not None and (len(parts) == 1 or alias.endswith("," + parts[-1])):
+        return alias
+    return key
+
+def geohash_encode(lat: float, lon: float, precision: int) -> str:
+    """Standard base32 geohash of a coordinate"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        rng, coord = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if coord >= mid:
+            value = (value << 1) | 1
+            rng[0] = mid
+        else:
+            value <<= 1
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_GEOHASH_ALPHABET[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+def geohash_center(geohash: str) -> Tuple[float, float]:
+    """(lat, lon) of the centre of a geohash cell"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            rng = lon_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (value >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lon_range[0] + lon_range[1]) / 2
@@ -10,6 +10,21 @@ from app.database import connect_to_mongo, close_mongo_connection
 # Import ML service
 from app.ml_service import ml_service
 
+# Import background services
+from app.fleet_service import fleet_service
+from app.auto_control_service import auto_control_worker
+from app.pump_events import pump_event_broker
+from app.pump_state import pump_state
+from app.audit_writer import audit_writer
+from app.analytics_service import pump_analytics
+from app.auth import user_cache, password_hasher
+from app.device_keys import device_key_index
+from app.device_cache import device_index
+from app.rate_limit import rate_limiter
+from app.purge_service import device_purger
+from app.weather_service import weather_service
+from app.weather_prefetcher import weather_prefetcher
+
 # Import routes
 from app.routes import auth, sensors, predictions, weather, devices, pump
 
@@ -22,9 +37,33 @@ async def lifespan(app: FastAPI):
     print("🚀 Starting Smart Irrigation API...")
     await connect_to_mongo()
     ml_service.load_models()
+    await weather_service.start()
+    await pump_state.warm()
+    await rate_limiter.setup()
+    await pump_event_broker.setup()
+    await device_purger.ensure_indexes()
+    await device_key_index.load()
+    device_key_index.start()
+    device_index.start()
+    pump_event_broker.start()
+    audit_writer.start()
+    fleet_service.start()
+    auto_control_worker.start()
+    device_purger.start()
+    weather_prefetcher.start()
     yield
     # Shutdown
     print("👋 Shutting down Smart Irrigation API...")
+    await weather_prefetcher.stop()
+    await device_purger.stop()
+    await fleet_service.stop()
+    await auto_control_worker.stop()
+    await device_key_index.stop()
+    await device_index.stop()
+    await pump_event_broker.stop()
+    await audit_writer.stop()
+    password_hasher.shutdown()
+    await weather_service.stop()
     await close_mongo_connection()
 
 # Create FastAPI app
@@ -43,6 +82,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Retry-After"],
 )
 
 # Register routes
@@ -72,6 +112,26 @@ async def health_check():
         "ml_service": "operational"
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Background service metrics"""
+    return {
+        "fleet_scoring": fleet_service.stats(),
+        "auto_control": auto_control_worker.stats(),
+        "pump_events": pump_event_broker.stats(),
+        "pump_state": pump_state.stats(),
+        "audit_writer": audit_writer.stats(),
+        "pump_analytics": pump_analytics.stats(),
+        "user_cache": user_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "device_keys": device_key_index.stats(),
+        "device_cache": device_index.stats(),
+        "rate_limits": rate_limiter.stats(),
+        "device_purge": device_purger.stats(),
+        "weather": weather_service.stats(),
+        "weather_prefetch": weather_prefetcher.stats()
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
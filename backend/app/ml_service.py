@@ -1,12 +1,33 @@
 import pickle
 import numpy as np
 import os
-from typing import Dict, Optional
+from typing import Dict, List, NamedTuple, Optional, Sequence
 from app.models import PredictionInput, PredictionResponse
+from app.rule_engine import (
+    decision_table,
+    device_thresholds,
+    thresholds_for_devices,
+    decision_codes,
+    describe,
+    RECOMMENDATIONS,
+    REASON_TEMPLATES,
+    IRRIGATE,
+    HOLD_RAIN_EXPECTED,
+    HOLD_RAINING,
+    NOT_NEEDED
+)
 from dotenv import load_dotenv
 
 load_dotenv()
 
+class BatchPrediction(NamedTuple):
+    """Lightweight prediction row for batch paths (same fields as PredictionResponse)"""
+    predicted_class: int
+    recommendation: str
+    confidence: float
+    should_irrigate: bool
+    reason: str
+
 class MLService:
     def __init__(self):
         self.model = None
@@ -47,11 +68,14 @@ class MLService:
             print("   Falling back to rule-based prediction")
             return False
     
-    def predict_irrigation(self, input_data: PredictionInput) -> PredictionResponse:
+    def predict_irrigation(self, input_data: PredictionInput,
+                           thresholds: Optional[Dict[str, float]] = None) -> PredictionResponse:
         """
         Make irrigation prediction based on sensor data
         
         Features: soil_moisture, temperature, humidity, rain_sensor, rain_probability
+        thresholds: the device's threshold overrides (rule_engine.device_overrides)
+        for the rule-based fallback
         Output: predicted_class (0=don't irrigate, 1=irrigate)
         """
         try:
@@ -83,10 +107,10 @@ class MLService:
                     predicted_class = int(prediction)
                 except Exception as model_err:
                     print(f"⚠️ ML Prediction error: {model_err}, falling back to rule-based")
-                    predicted_class, confidence = self._rule_based_prediction(input_data)
+                    predicted_class, confidence = self._rule_based_prediction(input_data, thresholds)
             else:
                 # Rule-based fallback prediction
-                predicted_class, confidence = self._rule_based_prediction(input_data)
+                predicted_class, confidence = self._rule_based_prediction(input_data, thresholds)
             
             # Determine final recommendation considering weather
             rain_probability = input_data.rain_probability or 0
@@ -97,20 +121,9 @@ class MLService:
             )
             
             # Generate recommendation text
-            if predicted_class == 1:
-                if should_irrigate:
-                    recommendation = "Irrigation recommended"
-                    reason = f"Low soil moisture ({input_data.soil_moisture:.1f}%) and low rain probability ({rain_probability:.1f}%)"
-                else:
-                    if rain_probability >= self.rain_threshold:
-                        recommendation = "Hold irrigation - rain expected"
-                        reason = f"High rain probability ({rain_probability:.1f}%) - natural watering expected"
-                    else:
-                        recommendation = "Hold irrigation - currently raining"
-                        reason = "Rain sensor detected precipitation"
-            else:
-                recommendation = "No irrigation needed"
-                reason = f"Soil moisture adequate ({input_data.soil_moisture:.1f}%)"
+            recommendation, reason = self._describe(
+                predicted_class, should_irrigate, input_data.soil_moisture, rain_probability
+            )
             
             return PredictionResponse(
                 predicted_class=predicted_class,
@@ -131,30 +144,103 @@ class MLService:
                 reason=f"Prediction error: {str(e)}"
             )
     
-    def _rule_based_prediction(self, input_data: PredictionInput) -> tuple:
+    def predict_irrigation_batch(
+        self,
+        features: np.ndarray,
+        thresholds: Optional[Sequence[Optional[Dict[str, float]]]] = None
+    ) -> List[BatchPrediction]:
         """
-        Simple rule-based prediction fallback
-        Returns: (predicted_class, confidence)
+        Vectorized counterpart of predict_irrigation for many devices at once
+        
+        features: (n, 5) array with the same column order as predict_irrigation
+        (soil_moisture, temperature, humidity, rain_sensor, rain_probability)
+        thresholds: optional per-row device threshold overrides for
+        the rule-based fallback (same as predict_irrigation's thresholds)
         """
-        soil_moisture = input_data.soil_moisture
-        temperature = input_data.temperature
-        humidity = input_data.humidity
+        features = np.asarray(features, dtype=float)
+        if len(features) == 0:
+            return []
+        
+        predicted_classes = None
+        if self.model is not None and self.scaler is not None:
+            try:
+                # One scaler/model call for the whole batch
+                features_scaled = self.scaler.transform(features)
+                predicted_classes = self.model.predict(features_scaled).astype(int)
+                try:
+                    confidences = self.model.predict_proba(features_scaled).max(axis=1)
+                except Exception:
+                    confidences = np.full(len(features), 0.85)
+            except Exception as model_err:
+                print(f"⚠️ ML batch prediction error: {model_err}, falling back to rule-based")
+                predicted_classes = None
+        
+        soil_moisture = features[:, 0]
+        rain_sensor = features[:, 3]
+        rain_probability = features[:, 4]
+        
+        if predicted_classes is None:
+            predicted_classes, confidences = decision_table.evaluate(
+                {
+                    "soil_moisture": soil_moisture,
+                    "temperature": features[:, 1],
+                    "humidity": features[:, 2]
+                },
+                thresholds_for_devices(thresholds) if thresholds is not None else None
+            )
         
-        # Rule: Irrigate if soil moisture < 40% and temperature > 20°C
-        if soil_moisture < 30:
-            confidence = 0.9
-            predicted_class = 1
-        elif soil_moisture < 40 and temperature > 25:
-            confidence = 0.75
-            predicted_class = 1
-        elif soil_moisture < 50 and temperature > 30 and humidity < 40:
-            confidence = 0.7
-            predicted_class = 1
+        should_irrigate = (
+            (predicted_classes == 1) &
+            (rain_probability < self.rain_threshold) &
+            (rain_sensor == 0)
+        )
+        codes = decision_codes(predicted_classes, should_irrigate, rain_probability, self.rain_threshold)
+        
+        # Plain tuples instead of one Pydantic model per row
+        return [
+            BatchPrediction(
+                predicted_class,
+                RECOMMENDATIONS[code],
+                confidence,
+                irrigate,
+                REASON_TEMPLATES[code](soil, rain)
+            )
+            for predicted_class, confidence, irrigate, code, soil, rain in zip(
+                predicted_classes.tolist(),
+                confidences.tolist(),
+                should_irrigate.tolist(),
+                codes.tolist(),
+                soil_moisture.tolist(),
+                rain_probability.tolist()
+            )
+        ]
+    
+    def _describe(self, predicted_class: int, should_irrigate: bool,
+                  soil_moisture: float, rain_probability: float) -> tuple:
+        """
+        Build the recommendation text for a decision
+        Returns: (recommendation, reason)
+        """
+        if should_irrigate:
+            code = IRRIGATE
+        elif predicted_class == 1:
+            code = HOLD_RAIN_EXPECTED if rain_probability >= self.rain_threshold else HOLD_RAINING
         else:
-            confidence = 0.85
-            predicted_class = 0
+            code = NOT_NEEDED
         
-        return predicted_class, confidence
+        return describe(code, soil_moisture, rain_probability)
+    
+    def _rule_based_prediction(self, input_data: PredictionInput,
+                               thresholds: Optional[Dict[str, float]] = None) -> tuple:
+        """
+        Simple rule-based prediction fallback (see app.rule_engine.DECISION_TABLE)
+        Returns: (predicted_class, confidence)
+        """
+        return decision_table.evaluate_one({
+            "soil_moisture": input_data.soil_moisture,
+            "temperature": input_data.temperature,
+            "humidity": input_data.humidity
+        }, device_thresholds(thresholds))
 
 # Global ML service instance
 ml_service = MLService()
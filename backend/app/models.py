@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field, validator
-from typing import Optional, Literal
-from datetime import datetime
+from typing import Optional, Literal, List, Dict
+from datetime import datetime, date
 from bson import ObjectId
 
 # Custom ObjectId type for MongoDB
@@ -53,14 +53,28 @@ class LoginRequest(BaseModel):
     password: str
 
 # Device Models
+class RuleThresholds(BaseModel):
+    """
+    Per-device overrides for the rule-based fallback, applied on top of the
+    crop_type defaults from RULE_THRESHOLDS_BY_CROP (see app.rule_engine)
+    """
+    critical_moisture: Optional[float] = Field(None, ge=0, le=100)
+    low_moisture: Optional[float] = Field(None, ge=0, le=100)
+    warm_temperature: Optional[float] = Field(None, ge=-50, le=60)
+    dry_moisture: Optional[float] = Field(None, ge=0, le=100)
+    hot_temperature: Optional[float] = Field(None, ge=-50, le=60)
+    dry_humidity: Optional[float] = Field(None, ge=0, le=100)
+
 class DeviceBase(BaseModel):
     device_name: str = Field(..., min_length=1, max_length=100)
     location: str = Field(..., min_length=1, max_length=200)
     crop_type: str = Field(..., min_length=1, max_length=50)
     moisture_threshold: float = Field(..., ge=0, le=100)
+    auto_mode: bool = Field(False, description="Evaluate pump control on every new reading")
+    pump_flow_rate_lpm: Optional[float] = Field(None, gt=0, description="Pump flow rate in litres per minute")
 
 class DeviceCreate(DeviceBase):
-    pass
+    rule_thresholds: Optional[RuleThresholds] = None
 
 class DeviceUpdate(BaseModel):
     device_name: Optional[str] = None
@@ -68,14 +82,45 @@ class DeviceUpdate(BaseModel):
     crop_type: Optional[str] = None
     moisture_threshold: Optional[float] = Field(None, ge=0, le=100)
     is_active: Optional[bool] = None
+    auto_mode: Optional[bool] = None
+    pump_flow_rate_lpm: Optional[float] = Field(None, gt=0)
+    rule_thresholds: Optional[RuleThresholds] = None
 
 class Device(DeviceBase):
     id: str
     user_id: str
     is_active: bool = True
+    rule_thresholds: Optional[dict] = None
+    has_api_key: bool = False
     created_at: datetime
     updated_at: datetime
 
+class DevicePurgeStatus(BaseModel):
+    device_id: str
+    device_name: Optional[str] = None
+    status: Literal["pending", "running", "done"]
+    deleted: Dict[str, int]
+    created_at: datetime
+    updated_at: datetime
+    completed_at: Optional[datetime] = None
+
+class DeviceFilter(BaseModel):
+    crop_type: Optional[str] = None
+    location_prefix: Optional[str] = Field(None, min_length=1)
+    is_active: Optional[bool] = None
+
+class DeviceBulkCreate(BaseModel):
+    devices: List[DeviceCreate] = Field(..., min_length=1, max_length=1000)
+
+class DeviceBulkUpdateItem(DeviceUpdate):
+    device_id: str
+
+class DeviceBulkUpdate(BaseModel):
+    """Per-device updates, one filter-based update, or both"""
+    updates: List[DeviceBulkUpdateItem] = Field(default_factory=list, max_length=1000)
+    filter: Optional[DeviceFilter] = None
+    update: Optional[DeviceUpdate] = None
+
 # Sensor Reading Models
 class SensorReadingBase(BaseModel):
     soil_moisture: float = Field(..., ge=0, le=100, description="Soil moisture percentage")
@@ -95,6 +140,16 @@ class SensorReading(SensorReadingBase):
     device_id: str
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
+class SensorReadingColumns(BaseModel):
+    """SensorReading list with format=columnar: one array per field"""
+    soil_moisture: List[float]
+    temperature: List[float]
+    humidity: List[float]
+    rain_sensor: List[int]
+    id: List[str]
+    device_id: List[str]
+    timestamp: List[datetime]
+
 # ML Prediction Models
 class PredictionInput(BaseModel):
     soil_moisture: float = Field(..., ge=0, le=100)
@@ -144,8 +199,33 @@ class PumpLog(BaseModel):
     weather_data: Optional[dict] = None
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
+class PumpLogColumns(BaseModel):
+    """PumpLog list with format=columnar: one array per field"""
+    id: List[str]
+    device_id: List[str]
+    pump_status: List[Literal["on", "off"]]
+    reason: List[str]
+    ml_prediction: List[Optional[dict]]
+    weather_data: List[Optional[dict]]
+    timestamp: List[datetime]
+
 class PumpStatus(BaseModel):
     device_id: str
     status: Literal["on", "off"]
     last_updated: datetime
     mode: Literal["manual", "auto"]
+
+# Pump Analytics Models
+class PumpRuntimeDay(BaseModel):
+    date: date
+    runtime_minutes: float
+    cycles: int
+    water_liters: float
+
+class PumpRuntimeAnalytics(BaseModel):
+    device_id: str
+    flow_rate_lpm: float
+    total_runtime_minutes: float
+    total_cycles: int
+    total_water_liters: float
+    days: List[PumpRuntimeDay]
@@ -0,0 +1,197 @@
+import asyncio
+import os
+import uuid
+from collections import defaultdict
+from typing import Dict, Any, Iterable, Optional, Set
+from datetime import datetime
+from bson import ObjectId
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+from dotenv import load_dotenv
+from app.database import get_database
+
+load_dotenv()
+
+class PumpEventBroker:
+    """
+    In-process pub/sub fan-out for pump status transitions.
+
+    Subscribers listen on topics ("device:<id>" or "user:<id>") and get
+    their own bounded queue. A slow subscriber never blocks publishers:
+    when its queue is full the oldest event is dropped. This base class
+    only reaches subscribers on the publishing worker.
+    """
+    backend = "memory"
+
+    def __init__(self):
+        self.queue_size = int(os.getenv("PUMP_EVENTS_QUEUE_SIZE", 100))
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    @staticmethod
+    def device_topic(device_id: str) -> str:
+        return f"device:{device_id}"
+
+    @staticmethod
+    def user_topic(user_id: str) -> str:
+        return f"user:{user_id}"
+
+    def subscribe(self, topics: Iterable[str]) -> asyncio.Queue:
+        """Register a new subscriber queue on the given topics"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        for topic in topics:
+            self._subscribers[topic].add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue, topics: Iterable[str]):
+        """Remove a subscriber queue"""
+        for topic in topics:
+            subscribers = self._subscribers.get(topic)
+            if subscribers is None:
+                continue
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[topic]
+
+    def publish_status(self, device_id: str, user_id: str, status: str, mode: str,
+                       timestamp: datetime):
+        """Fan a pump status transition out to device and user subscribers"""
+        event = {
+            "type": "pump_status",
+            "device_id": device_id,
+            "status": status,
+            "mode": mode,
+            "last_updated": timestamp.isoformat()
+        }
+        self.published += 1
+        self._publish(event, user_id)
+
+    def _publish(self, event: dict, user_id: str):
+        self._deliver(event, user_id)
+
+    def _deliver(self, event: dict, user_id: str):
+        """Put an event on the queues of this worker's subscribers"""
+        device_id = event["device_id"]
+        # A queue subscribed to both topics only gets the event once
+        queues = set()
+        for topic in (self.device_topic(device_id), self.user_topic(user_id)):
+            queues |= self._subscribers.get(topic, set())
+
+        for queue in queues:
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(event)
+            self.delivered += 1
+
+    async def setup(self):
+        """Nothing to prepare for the in-memory backend"""
+
+    def start(self):
+        """Nothing to run for the in-memory backend"""
+
+    async def stop(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Broker metrics"""
+        return {
+            "backend": self.backend,
+            "topics": len(self._subscribers),
+            "subscribers": sum(len(s) for s in self._subscribers.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped
+        }
+
+
+class MongoPumpEventBroker(PumpEventBroker):
+    """
+    Pump events shared by all workers through the capped pump_events
+    collection. Events are delivered to local subscribers right away and
+    inserted into the collection; every worker tails it with a tailable
+    cursor and delivers the events published by the other workers, so a
+    WebSocket client sees transitions whichever worker made them.
+    """
+    backend = "mongo"
+
+    def __init__(self, capped_bytes: int):
+        super().__init__()
+        self.capped_bytes = capped_bytes
+        self.worker_id = uuid.uuid4().hex
+        self._task: Optional[asyncio.Task] = None
+        self._writes: Set[asyncio.Task] = set()
+        self.received = 0
+        self.errors = 0
+
+    def _publish(self, event: dict, user_id: str):
+        self._deliver(event, user_id)
+        # Publishers are synchronous; the insert runs in the background
+        write = asyncio.create_task(self._insert({
+            "origin": self.worker_id,
+            "user_id": user_id,
+            "event": event
+        }))
+        self._writes.add(write)
+        write.add_done_callback(self._writes.discard)
+
+    async def _insert(self, doc: dict):
+        try:
+            await get_database().pump_events.insert_one(doc)
+        except Exception as e:
+            self.errors += 1
+            print(f"❌ Pump event publish failed: {e}")
+
+    async def setup(self):
+        """Create the capped collection (tailable cursors need one)"""
+        try:
+            await get_database().create_collection("pump_events", capped=True, size=self.capped_bytes)
+        except CollectionInvalid:
+            pass
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._tail())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _tail(self):
+        db = get_database()
+        # Only events published after this worker started
+        last_id = ObjectId.from_datetime(datetime.utcnow())
+        while True:
+            cursor = db.pump_events.find({"_id": {"$gt": last_id}}, cursor_type=CursorType.TAILABLE_AWAIT)
+            try:
+                async for doc in cursor:
+                    last_id = doc["_id"]
+                    if doc.get("origin") != self.worker_id:
+                        self.received += 1
+                        self._deliver(doc["event"], doc["user_id"])
+            except Exception as e:
+                self.errors += 1
+                print(f"❌ Pump event tail failed: {e}")
+            # The cursor dies when the collection is empty or on errors
+            await asyncio.sleep(1)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "received": self.received, "errors": self.errors}
+
+
+def create_pump_event_broker() -> PumpEventBroker:
+    """Build the configured pump event broker"""
+    backend = os.getenv("PUMP_EVENTS_BACKEND", "memory").lower()
+    if backend == "mongo":
+        return MongoPumpEventBroker(int(os.getenv("PUMP_EVENTS_CAPPED_BYTES", 16 * 1024 * 1024)))
+    return PumpEventBroker()
+
+# Global instance
+pump_event_broker = create_pump_event_broker()
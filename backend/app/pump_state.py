@@ -0,0 +1,322 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, Optional
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument, UpdateOne
+from dotenv import load_dotenv
+from app.database import get_database
+
+load_dotenv()
+
+# Entry shape: {"status": "on"|"off", "mode": "manual"|"auto",
+#               "timestamp": datetime, "changed_at": datetime}
+
+class InMemoryPumpStateStore:
+    """
+    Per-process pump state (single worker deployments).
+
+    Bounded LRU with per-entry expiry. On startup it is warmed from the
+    latest pump log per device, so status reads never scan pump_logs.
+    """
+    backend = "memory"
+
+    def __init__(self, ttl_hours: float, max_entries: int, warm_timeout: float):
+        self.ttl = timedelta(hours=ttl_hours)
+        self.max_entries = max_entries
+        self.warm_timeout = warm_timeout
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _merge(self, previous: Optional[dict], entry: dict) -> dict:
+        """Carry changed_at over when the status did not change"""
+        merged = dict(entry)
+        if previous and previous["status"] == entry["status"]:
+            merged["changed_at"] = previous.get("changed_at", previous["timestamp"])
+        else:
+            merged["changed_at"] = entry["timestamp"]
+        return merged
+
+    def _get_local(self, device_id: str) -> Optional[dict]:
+        entry = self._entries.get(device_id)
+        if entry is None:
+            return None
+        if datetime.utcnow() - entry["timestamp"] >= self.ttl:
+            self._evict(device_id)
+            return None
+        self._entries.move_to_end(device_id)
+        return entry
+
+    def _set_local(self, device_id: str, entry: dict):
+        self._entries[device_id] = entry
+        self._entries.move_to_end(device_id)
+        while len(self._entries) > self.max_entries:
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, device_id: str):
+        del self._entries[device_id]
+        self.evictions += 1
+
+    async def get(self, device_id: str) -> Optional[dict]:
+        entry = self._get_local(device_id)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    async def get_many(self, device_ids: Iterable[str]) -> Dict[str, dict]:
+        """Current state of several devices (devices without state are omitted)"""
+        entries = {}
+        for device_id in device_ids:
+            entry = await self.get(device_id)
+            if entry is not None:
+                entries[device_id] = entry
+        return entries
+
+    async def set(self, device_id: str, entry: dict) -> dict:
+        merged = self._merge(self._get_local(device_id), entry)
+        self._set_local(device_id, merged)
+        return merged
+
+    async def set_many(self, entries: Dict[str, dict]):
+        for device_id, entry in entries.items():
+            await self.set(device_id, entry)
+
+    async def delete(self, device_id: str):
+        self._entries.pop(device_id, None)
+
+    def _latest_logs_pipeline(self) -> list:
+        """Latest pump log per device within the state TTL"""
+        return [
+            # Bounds on both keys of the (device_id, timestamp) index, so the
+            # sort below walks the index instead of sorting in memory
+            {"$match": {
+                "device_id": {"$type": "string"},
+                "timestamp": {"$gte": datetime.utcnow() - self.ttl}
+            }},
+            {"$sort": {"device_id": 1, "timestamp": -1}},
+            {"$group": {
+                "_id": "$device_id",
+                "status": {"$first": "$pump_status"},
+                "timestamp": {"$first": "$timestamp"},
+                "ml_prediction": {"$first": "$ml_prediction"}
+            }}
+        ]
+
+    async def _ensure_log_index(self):
+        db = get_database()
+        await db.pump_logs.create_index([("device_id", 1), ("timestamp", -1)])
+
+    async def warm(self):
+        """
+        Load the latest pump log per device in one aggregation. Bounded by
+        warm_timeout; on failure the worker starts cold (unknown devices
+        read as "off" until their next switch) instead of failing startup.
+        """
+        db = get_database()
+        try:
+            await self._ensure_log_index()
+            latest = await db.pump_logs.aggregate(
+                self._latest_logs_pipeline(), maxTimeMS=int(self.warm_timeout * 1000)
+            ).to_list(length=None)
+        except Exception as e:
+            print(f"⚠️ Pump state warm-up skipped: {e}")
+            return
+        for doc in latest:
+            self._set_local(doc["_id"], {
+                "status": doc["status"],
+                "mode": "auto" if doc.get("ml_prediction") else "manual",
+                "timestamp": doc["timestamp"],
+                "changed_at": doc["timestamp"]
+            })
+        print(f"✅ Pump state warmed for {len(latest)} devices")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions
+        }
+
+
+class MongoPumpStateStore(InMemoryPumpStateStore):
+    """
+    Pump state shared by all workers through the pump_state collection.
+
+    Writes go to Mongo first and then to a short-lived local cache
+    (write-through), so repeated /status reads on one worker skip the
+    round-trip while other workers see changes within local_ttl seconds.
+    Documents expire through a TTL index on expires_at.
+    """
+    backend = "mongo"
+
+    def __init__(self, ttl_hours: float, max_entries: int, warm_timeout: float, local_ttl_seconds: float):
+        super().__init__(ttl_hours, max_entries, warm_timeout)
+        self.local_ttl = local_ttl_seconds
+        # device_id -> monotonic time the local copy was loaded
+        self._loaded_at: Dict[str, float] = {}
+
+    def _fresh_local(self, device_id: str) -> Optional[dict]:
+        loaded_at = self._loaded_at.get(device_id)
+        if loaded_at is None or time.monotonic() - loaded_at >= self.local_ttl:
+            return None
+        return self._get_local(device_id)
+
+    def _set_local(self, device_id: str, entry: dict):
+        self._loaded_at[device_id] = time.monotonic()
+        super()._set_local(device_id, entry)
+
+    def _evict(self, device_id: str):
+        super()._evict(device_id)
+        self._loaded_at.pop(device_id, None)
+
+    @staticmethod
+    def _strip(doc: dict) -> dict:
+        return {
+            "status": doc["status"],
+            "mode": doc["mode"],
+            "timestamp": doc["timestamp"],
+            "changed_at": doc.get("changed_at", doc["timestamp"])
+        }
+
+    def _update(self, entry: dict) -> list:
+        """Update pipeline that keeps changed_at unless the status flips"""
+        return [{"$set": {
+            "changed_at": {"$cond": [
+                {"$eq": ["$status", entry["status"]]},
+                {"$ifNull": ["$changed_at", entry["timestamp"]]},
+                entry["timestamp"]
+            ]},
+            "status": entry["status"],
+            "mode": entry["mode"],
+            "timestamp": entry["timestamp"],
+            "expires_at": entry["timestamp"] + self.ttl
+        }}]
+
+    async def get(self, device_id: str) -> Optional[dict]:
+        entry = self._fresh_local(device_id)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        db = get_database()
+        doc = await db.pump_state.find_one({"_id": device_id})
+        if doc is None or doc["expires_at"] <= datetime.utcnow():
+            return None
+        entry = self._strip(doc)
+        self._set_local(device_id, entry)
+        return entry
+
+    async def get_many(self, device_ids: Iterable[str]) -> Dict[str, dict]:
+        """Fresh local copies first, then one query for the rest"""
+        entries = {}
+        missing = []
+        for device_id in device_ids:
+            entry = self._fresh_local(device_id)
+            if entry is None:
+                missing.append(device_id)
+            else:
+                entries[device_id] = entry
+        self.hits += len(entries)
+        self.misses += len(missing)
+        if missing:
+            db = get_database()
+            async for doc in db.pump_state.find({"_id": {"$in": missing}, "expires_at": {"$gt": datetime.utcnow()}}):
+                entry = self._strip(doc)
+                self._set_local(doc["_id"], entry)
+                entries[doc["_id"]] = entry
+        return entries
+
+    async def set(self, device_id: str, entry: dict) -> dict:
+        db = get_database()
+        doc = await db.pump_state.find_one_and_update(
+            {"_id": device_id},
+            self._update(entry),
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        merged = self._strip(doc)
+        self._set_local(device_id, merged)
+        return merged
+
+    async def set_many(self, entries: Dict[str, dict]):
+        if not entries:
+            return
+        db = get_database()
+        await db.pump_state.bulk_write(
+            [
+                UpdateOne({"_id": device_id}, self._update(entry), upsert=True)
+                for device_id, entry in entries.items()
+            ],
+            ordered=False
+        )
+        # changed_at is resolved server-side; drop local copies instead of guessing
+        for device_id in entries:
+            self._entries.pop(device_id, None)
+            self._loaded_at.pop(device_id, None)
+
+    async def delete(self, device_id: str):
+        db = get_database()
+        await db.pump_state.delete_one({"_id": device_id})
+        self._entries.pop(device_id, None)
+        self._loaded_at.pop(device_id, None)
+
+    async def warm(self):
+        """
+        Ensure the TTL index, and seed an empty pump_state collection from
+        the latest pump log per device (first start after switching from
+        the memory backend). The seed runs server-side with $merge and
+        never overwrites state written by another worker meanwhile.
+        """
+        db = get_database()
+        try:
+            await db.pump_state.create_index("expires_at", expireAfterSeconds=0)
+            if await db.pump_state.estimated_document_count() > 0:
+                return
+            await self._ensure_log_index()
+            ttl_ms = self.ttl.total_seconds() * 1000
+            await db.pump_logs.aggregate(
+                self._latest_logs_pipeline() + [
+                    {"$project": {
+                        "status": 1,
+                        "mode": {"$cond": [{"$ifNull": ["$ml_prediction", False]}, "auto", "manual"]},
+                        "timestamp": 1,
+                        "changed_at": "$timestamp",
+                        "expires_at": {"$add": ["$timestamp", ttl_ms]}
+                    }},
+                    {"$merge": {"into": "pump_state", "whenMatched": "keepExisting", "whenNotMatched": "insert"}}
+                ],
+                maxTimeMS=int(self.warm_timeout * 1000)
+            ).to_list(length=None)
+            print(f"✅ Pump state seeded from pump logs ({await db.pump_state.estimated_document_count()} devices)")
+        except Exception as e:
+            print(f"⚠️ Pump state warm-up skipped: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "local_ttl_seconds": self.local_ttl}
+
+
+def create_pump_state_store():
+    """Build the configured pump state backend"""
+    backend = os.getenv("PUMP_STATE_BACKEND", "memory").lower()
+    ttl_hours = float(os.getenv("PUMP_STATE_TTL_HOURS", 168))
+    max_entries = int(os.getenv("PUMP_STATE_MAX_ENTRIES", 50000))
+    warm_timeout = float(os.getenv("PUMP_STATE_WARM_TIMEOUT_SECONDS", 10))
+    if backend == "mongo":
+        return MongoPumpStateStore(
+            ttl_hours,
+            max_entries,
+            warm_timeout,
+            float(os.getenv("PUMP_STATE_LOCAL_TTL_SECONDS", 2))
+        )
+    return InMemoryPumpStateStore(ttl_hours, max_entries, warm_timeout)
+
+# Global instance
+pump_state = create_pump_state_store()
@@ -0,0 +1,196 @@
+import asyncio
+import os
+import uuid
+from typing import Dict, Any, Optional
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument
+from dotenv import load_dotenv
+from app.database import get_database
+from app.pump_state import pump_state
+from app.analytics_service import pump_analytics
+
+load_dotenv()
+
+# Per-device collections removed when a device is deleted, in purge order
+PURGED_COLLECTIONS = ("sensor_readings", "pump_logs")
+
+class DevicePurgeService:
+    """
+    Background cascade delete for devices.
+
+    Deleting a device marks the device document deleted and records a job
+    in device_purge_jobs. The job becomes claimable after
+    DEVICE_PURGE_GRACE_SECONDS, once every worker's device and key caches
+    have dropped the device and no more readings can arrive for it; this
+    service then deletes the device's readings and pump logs in bounded
+    batches with a pause between them, and finally the device document,
+    so a device with years of data neither holds the request open nor
+    saturates the database. Progress is stored on the job after every
+    batch. Jobs are claimed with a renewable lease, so a job interrupted
+    by a restart (or held by a dead worker) is resumed once the lease
+    expires, and several workers never purge the same device.
+    """
+    def __init__(self):
+        self.batch_size = int(os.getenv("DEVICE_PURGE_BATCH_SIZE", 1000))
+        self.batch_delay = float(os.getenv("DEVICE_PURGE_BATCH_DELAY_SECONDS", 0.1))
+        self.poll_interval = float(os.getenv("DEVICE_PURGE_POLL_SECONDS", 30))
+        self.lease = timedelta(seconds=float(os.getenv("DEVICE_PURGE_LEASE_SECONDS", 60)))
+        self.retention = timedelta(days=float(os.getenv("DEVICE_PURGE_JOB_RETENTION_DAYS", 7)))
+        # Longer than DEVICE_KEY_REFRESH_SECONDS and the device cache TTL/sync
+        self.grace = timedelta(seconds=float(os.getenv("DEVICE_PURGE_GRACE_SECONDS", 90)))
+        self.worker_id = uuid.uuid4().hex
+        self._task: Optional[asyncio.Task] = None
+        self.jobs_completed = 0
+        self.documents_deleted = 0
+        self.failures = 0
+        self.current_job: Optional[str] = None
+
+    async def schedule(self, device: dict):
+        """Record a purge job for a device that has been marked deleted"""
+        db = get_database()
+        now = datetime.utcnow()
+        await db.device_purge_jobs.update_one(
+            {"_id": str(device["_id"])},
+            {"$setOnInsert": {
+                "user_id": device["user_id"],
+                "device_name": device.get("device_name"),
+                "status": "pending",
+                "deleted": {name: 0 for name in PURGED_COLLECTIONS},
+                "created_at": now,
+                "updated_at": now,
+                "lease_until": now + self.grace
+            }},
+            upsert=True
+        )
+
+    async def get_job(self, device_id: str, user_id: str) -> Optional[dict]:
+        """Purge progress for one of the user's deleted devices"""
+        db = get_database()
+        return await db.device_purge_jobs.find_one(
+            {"_id": device_id, "user_id": user_id},
+            {"lease_until": 0, "worker_id": 0, "expires_at": 0}
+        )
+
+    def start(self):
+        """Start the background purger"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop after the current batch; unfinished jobs resume on the next start"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def ensure_indexes(self):
+        db = get_database()
+        await db.device_purge_jobs.create_index([("status", 1), ("lease_until", 1)])
+        await db.device_purge_jobs.create_index("expires_at", expireAfterSeconds=0)
+        # Claim order, and the device cache's cross-worker sync
+        await db.device_purge_jobs.create_index("created_at")
+
+    async def _run(self):
+        while True:
+            try:
+                while await self._claim_and_purge():
+                    pass
+            except Exception as e:
+                self.failures += 1
+                print(f"❌ Device purge failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def _claim(self) -> Optional[dict]:
+        """Take the oldest job that is pending or whose lease has expired"""
+        db = get_database()
+        now = datetime.utcnow()
+        return await db.device_purge_jobs.find_one_and_update(
+            {"status": {"$in": ["pending", "running"]}, "lease_until": {"$lte": now}},
+            {"$set": {
+                "status": "running",
+                "worker_id": self.worker_id,
+                "lease_until": now + self.lease,
+                "updated_at": now
+            }},
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _claim_and_purge(self) -> bool:
+        """Run one job to completion; returns False when there is nothing to do"""
+        job = await self._claim()
+        if job is None:
+            return False
+        device_id = job["_id"]
+        self.current_job = device_id
+        try:
+            for collection in PURGED_COLLECTIONS:
+                if not await self._purge_collection(device_id, collection):
+                    # Lost the lease to another worker
+                    return True
+            await self._finish(device_id)
+        finally:
+            self.current_job = None
+        return True
+
+    async def _purge_collection(self, device_id: str, collection: str) -> bool:
+        """Delete a device's documents batch by batch, renewing the lease each time"""
+        db = get_database()
+        while True:
+            # Walks the (device_id, timestamp) index; only ids are fetched
+            ids = [
+                doc["_id"] async for doc in
+                db[collection].find({"device_id": device_id}, {"_id": 1}).limit(self.batch_size)
+            ]
+            if not ids:
+                return True
+            result = await db[collection].delete_many({"_id": {"$in": ids}})
+            self.documents_deleted += result.deleted_count
+
+            now = datetime.utcnow()
+            renewed = await db.device_purge_jobs.update_one(
+                {"_id": device_id, "worker_id": self.worker_id},
+                {
+                    "$inc": {f"deleted.{collection}": result.deleted_count},
+                    "$set": {"lease_until": now + self.lease, "updated_at": now}
+                }
+            )
+            if renewed.matched_count == 0:
+                return False
+            await asyncio.sleep(self.batch_delay)
+
+    async def _finish(self, device_id: str):
+        """Remove the device document, drop derived state and mark the job done"""
+        db = get_database()
+        await db.devices.delete_one({"_id": ObjectId(device_id), "deleted_at": {"$exists": True}})
+        await pump_state.delete(device_id)
+        pump_analytics.invalidate_device(device_id)
+
+        now = datetime.utcnow()
+        await db.device_purge_jobs.update_one(
+            {"_id": device_id, "worker_id": self.worker_id},
+            {"$set": {
+                "status": "done",
+                "completed_at": now,
+                "updated_at": now,
+                "expires_at": now + self.retention
+            }}
+        )
+        self.jobs_completed += 1
+        print(f"🧹 Purged data for deleted device {device_id}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "current_job": self.current_job,
+            "jobs_completed": self.jobs_completed,
+            "documents_deleted": self.documents_deleted,
+            "failures": self.failures
+        }
+
+# Global instance
+device_purger = DevicePurgeService()
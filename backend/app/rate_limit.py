@@ -0,0 +1,177 @@
+import math
+import os
+import time
+from collections import defaultdict
+from typing import Dict, Any, List, NamedTuple, Tuple
+from fastapi import HTTPException, status
+from pymongo import ReturnDocument
+from dotenv import load_dotenv
+from app.database import get_database
+
+load_dotenv()
+
+class RateLimitRule(NamedTuple):
+    rate_per_second: float
+    burst: float
+
+def _rule_from_env(prefix: str, per_minute: float, burst: float) -> RateLimitRule:
+    return RateLimitRule(
+        float(os.getenv(f"{prefix}_PER_MINUTE", per_minute)) / 60,
+        float(os.getenv(f"{prefix}_BURST", burst))
+    )
+
+# Limits per route; a rate of 0 disables the rule
+RATE_LIMIT_RULES: Dict[str, RateLimitRule] = {
+    # keyed by device_id
+    "sensor_readings": _rule_from_env("RATE_LIMIT_SENSOR_READINGS", 60, 10),
+    # keyed by user id
+    "pump_auto": _rule_from_env("RATE_LIMIT_PUMP_AUTO", 12, 5),
+}
+
+class InMemoryRateLimiter:
+    """
+    Token-bucket rate limiter local to this worker.
+
+    Each (rule, key) holds a two-item [tokens, last_refill] list, refilled
+    lazily on access, so memory is O(1) per key and a check is a dict
+    lookup plus a few float operations. Buckets that have refilled
+    completely are indistinguishable from new ones and are pruned
+    periodically.
+    """
+    backend = "memory"
+
+    def __init__(self, rules: Dict[str, RateLimitRule], prune_interval: float):
+        self.rules = rules
+        self.prune_interval = prune_interval
+        self._buckets: Dict[Tuple[str, str], List[float]] = {}
+        self._next_prune = time.monotonic() + prune_interval
+        self.allowed: Dict[str, int] = defaultdict(int)
+        self.limited: Dict[str, int] = defaultdict(int)
+        self.errors = 0
+
+    def _take(self, rule_name: str, key: str, rule: RateLimitRule, now: float) -> float:
+        """Consume one token; returns 0 if allowed, else seconds until one is available"""
+        bucket = self._buckets.get((rule_name, key))
+        if bucket is None:
+            self._buckets[(rule_name, key)] = [rule.burst - 1, now]
+            return 0.0
+        tokens = min(rule.burst, bucket[0] + (now - bucket[1]) * rule.rate_per_second)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return 0.0
+        bucket[0] = tokens
+        return (1 - tokens) / rule.rate_per_second
+
+    def _prune(self, now: float):
+        full = [
+            bucket_key for bucket_key, (tokens, last) in self._buckets.items()
+            if tokens + (now - last) * self.rules[bucket_key[0]].rate_per_second
+            >= self.rules[bucket_key[0]].burst
+        ]
+        for bucket_key in full:
+            del self._buckets[bucket_key]
+
+    async def _retry_after(self, rule_name: str, key: str, rule: RateLimitRule) -> float:
+        now = time.monotonic()
+        if now >= self._next_prune:
+            self._prune(now)
+            self._next_prune = now + self.prune_interval
+        return self._take(rule_name, key, rule, now)
+
+    async def check(self, rule_name: str, key: str):
+        """Consume one request for key under rule_name or raise 429 with Retry-After"""
+        rule = self.rules.get(rule_name)
+        if rule is None or rule.rate_per_second <= 0:
+            return
+        retry_after = await self._retry_after(rule_name, key, rule)
+        if retry_after <= 0:
+            self.allowed[rule_name] += 1
+            return
+        self.limited[rule_name] += 1
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+    async def setup(self):
+        """Nothing to prepare for the in-memory backend"""
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "buckets": len(self._buckets),
+            "allowed": dict(self.allowed),
+            "limited": dict(self.limited),
+            "errors": self.errors
+        }
+
+
+class MongoRateLimiter(InMemoryRateLimiter):
+    """
+    Token buckets shared by all workers through the rate_limits collection.
+
+    Each check is one atomic find_one_and_update whose update pipeline
+    refills and consumes the bucket server-side using the database clock.
+    Buckets expire through a TTL index once they would be full again. If
+    the database is unavailable requests are allowed (fail open) and
+    counted as errors.
+    """
+    backend = "mongo"
+
+    def _update(self, rule: RateLimitRule) -> list:
+        elapsed = {"$divide": [{"$subtract": ["$$NOW", {"$ifNull": ["$updated_at", "$$NOW"]}]}, 1000]}
+        return [
+            {"$set": {"available": {"$min": [
+                rule.burst,
+                {"$add": [{"$ifNull": ["$tokens", rule.burst]}, {"$multiply": [elapsed, rule.rate_per_second]}]}
+            ]}}},
+            {"$set": {
+                "allowed": {"$gte": ["$available", 1]},
+                "tokens": {"$cond": [
+                    {"$gte": ["$available", 1]}, {"$subtract": ["$available", 1]}, "$available"
+                ]},
+                "updated_at": "$$NOW",
+                "expires_at": {"$add": ["$$NOW", rule.burst / rule.rate_per_second * 1000]}
+            }},
+            {"$unset": "available"}
+        ]
+
+    async def _retry_after(self, rule_name: str, key: str, rule: RateLimitRule) -> float:
+        db = get_database()
+        try:
+            doc = await db.rate_limits.find_one_and_update(
+                {"_id": f"{rule_name}:{key}"},
+                self._update(rule),
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except Exception as e:
+            self.errors += 1
+            print(f"❌ Rate limit check failed, allowing request: {e}")
+            return 0.0
+        if doc["allowed"]:
+            return 0.0
+        return (1 - doc["tokens"]) / rule.rate_per_second
+
+    async def setup(self):
+        db = get_database()
+        await db.rate_limits.create_index("expires_at", expireAfterSeconds=0)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        del stats["buckets"]
+        return stats
+
+
+def create_rate_limiter():
+    """Build the configured rate limiter backend"""
+    backend = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    prune_interval = float(os.getenv("RATE_LIMIT_PRUNE_SECONDS", 60))
+    if backend == "mongo":
+        return MongoRateLimiter(RATE_LIMIT_RULES, prune_interval)
+    return InMemoryRateLimiter(RATE_LIMIT_RULES, prune_interval)
+
+# Global instance
+rate_limiter = create_rate_limiter()
@@ -1,11 +1,12 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from app.models import UserCreate, Token, LoginRequest, User
 from app.auth import (
-    get_password_hash, 
-    verify_password, 
+    get_password_hash_async,
+    verify_password_async,
     create_access_token,
     get_current_user,
-    get_user_by_email
+    get_user_by_email,
+    invalidate_user
 )
 from app.database import get_database
 from datetime import datetime
@@ -34,7 +35,7 @@ async def register(user_data: UserCreate):
         )
     
     # Hash password
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     
     # Create user document
     user_doc = {
@@ -46,6 +47,7 @@ async def register(user_data: UserCreate):
     
     # Insert user
     result = await db.users.insert_one(user_doc)
+    invalidate_user(user_data.email)
     
     return {
         "message": "User registered successfully",
@@ -67,7 +69,7 @@ async def login(login_data: LoginRequest):
         )
     
     # Verify password
-    if not verify_password(login_data.password, user["hashed_password"]):
+    if not await verify_password_async(login_data.password, user["hashed_password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
@@ -1,13 +1,99 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List
-from app.models import DeviceCreate, DeviceUpdate, Device, User
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
+from typing import List, Optional
+from app.models import (
+    DeviceCreate, DeviceUpdate, Device, DevicePurgeStatus, DeviceFilter,
+    DeviceBulkCreate, DeviceBulkUpdate, User
+)
 from app.auth import get_current_user
 from app.database import get_database
+from app.device_keys import device_key_index
+from app.device_cache import NOT_DELETED, device_index, get_owned_device
+from app.purge_service import device_purger
+from app.auto_control_service import auto_control_worker
+from app.analytics_service import pump_analytics
 from datetime import datetime
 from bson import ObjectId
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+import re
 
 router = APIRouter(prefix="/api/devices", tags=["devices"])
 
+# Fields needed to build a Device response
+DEVICE_PROJECTION = {
+    "user_id": 1,
+    "device_name": 1,
+    "location": 1,
+    "crop_type": 1,
+    "moisture_threshold": 1,
+    "is_active": 1,
+    "auto_mode": 1,
+    "pump_flow_rate_lpm": 1,
+    "api_key_hash": 1,
+    "rule_thresholds": 1,
+    "created_at": 1,
+    "updated_at": 1
+}
+
+def _to_device(d: dict) -> dict:
+    """Device response fields from a device document (validated once by response_model)"""
+    return {
+        "id": str(d["_id"]),
+        "user_id": d["user_id"],
+        "device_name": d["device_name"],
+        "location": d["location"],
+        "crop_type": d["crop_type"],
+        "moisture_threshold": d["moisture_threshold"],
+        "is_active": d.get("is_active", True),
+        "auto_mode": d.get("auto_mode", False),
+        "pump_flow_rate_lpm": d.get("pump_flow_rate_lpm"),
+        "has_api_key": "api_key_hash" in d,
+        "rule_thresholds": d.get("rule_thresholds"),
+        "created_at": d["created_at"],
+        "updated_at": d.get("updated_at", d["created_at"])
+    }
+
+def _new_device_doc(device_data: DeviceCreate, user_id: str) -> dict:
+    now = datetime.utcnow()
+    doc = {
+        "user_id": user_id,
+        "device_name": device_data.device_name,
+        "location": device_data.location,
+        "crop_type": device_data.crop_type,
+        "moisture_threshold": device_data.moisture_threshold,
+        "auto_mode": device_data.auto_mode,
+        "pump_flow_rate_lpm": device_data.pump_flow_rate_lpm,
+        "is_active": True,
+        "created_at": now,
+        "updated_at": now
+    }
+    if device_data.rule_thresholds is not None:
+        doc["rule_thresholds"] = device_data.rule_thresholds.model_dump(exclude_none=True)
+    return doc
+
+def _update_fields(device_update: DeviceUpdate) -> dict:
+    """$set document with only the provided fields"""
+    update_data = device_update.model_dump(
+        exclude_none=True, exclude={"device_id", "rule_thresholds"}
+    )
+    if device_update.rule_thresholds is not None:
+        update_data["rule_thresholds"] = device_update.rule_thresholds.model_dump(exclude_none=True)
+    update_data["updated_at"] = datetime.utcnow()
+    return update_data
+
+def _filter_query(user_id: str, device_filter: DeviceFilter) -> dict:
+    query = {"user_id": user_id, **NOT_DELETED}
+    if device_filter.is_active is not None:
+        # Documents without is_active count as active
+        query["is_active"] = {"$ne": False} if device_filter.is_active else False
+    if device_filter.crop_type is not None:
+        query["crop_type"] = device_filter.crop_type
+    if device_filter.location_prefix is not None:
+        # Anchored, case-sensitive prefix: bounds a range scan of the
+        # (user_id, location, _id) index
+        query["location"] = {"$regex": "^" + re.escape(device_filter.location_prefix)}
+    return query
+
 @router.post("", response_model=dict, status_code=status.HTTP_201_CREATED)
 async def create_device(
     device_data: DeviceCreate,
@@ -17,19 +103,11 @@ async def create_device(
     db = get_database()
     
     # Create device document
-    device_doc = {
-        "user_id": current_user.id,
-        "device_name": device_data.device_name,
-        "location": device_data.location,
-        "crop_type": device_data.crop_type,
-        "moisture_threshold": device_data.moisture_threshold,
-        "is_active": True,
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow()
-    }
+    device_doc = _new_device_doc(device_data, current_user.id)
     
     # Insert device
     result = await db.devices.insert_one(device_doc)
+    device_index.invalidate(current_user.id)
     
     return {
         "message": "Device created successfully",
@@ -37,128 +115,294 @@ async def create_device(
     }
 
 @router.get("", response_model=List[Device])
-async def get_user_devices(current_user: User = Depends(get_current_user)):
-    """Get all devices for the current user"""
+async def get_user_devices(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    after: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    is_active: Optional[bool] = None,
+    crop_type: Optional[str] = None,
+    location_prefix: Optional[str] = Query(None, min_length=1),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get devices for the current user, oldest first
+    
+    Keyset paginated on _id: when more devices match, the response carries
+    an X-Next-Cursor header to pass as `after` for the next page.
+    """
     db = get_database()
     
-    cursor = db.devices.find({"user_id": current_user.id})
-    devices = await cursor.to_list(length=100)
-    
-    return [
-        Device(
-            id=str(d["_id"]),
-            user_id=d["user_id"],
-            device_name=d["device_name"],
-            location=d["location"],
-            crop_type=d["crop_type"],
-            moisture_threshold=d["moisture_threshold"],
-            is_active=d.get("is_active", True),
-            created_at=d["created_at"],
-            updated_at=d.get("updated_at", d["created_at"])
-        )
-        for d in devices
-    ]
+    query = _filter_query(current_user.id, DeviceFilter(
+        is_active=is_active, crop_type=crop_type, location_prefix=location_prefix
+    ))
+    if after is not None:
+        if not ObjectId.is_valid(after):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        query["_id"] = {"$gt": ObjectId(after)}
+    
+    # Fetch one extra document to know whether another page exists
+    cursor = db.devices.find(query, DEVICE_PROJECTION).sort("_id", 1).limit(limit + 1)
+    devices = [_to_device(d) async for d in cursor]
+    
+    if len(devices) > limit:
+        devices = devices[:limit]
+        response.headers["X-Next-Cursor"] = devices[-1]["id"]
+    
+    return devices
 
-@router.get("/{device_id}", response_model=Device)
-async def get_device(
-    device_id: str,
+@router.post("/bulk", response_model=dict, status_code=status.HTTP_201_CREATED)
+async def bulk_create_devices(
+    bulk: DeviceBulkCreate,
     current_user: User = Depends(get_current_user)
 ):
-    """Get a specific device by ID"""
+    """
+    Create up to 1000 devices in one unordered bulk write
+    
+    Returns one result per input item, in input order.
+    """
     db = get_database()
     
-    device = await db.devices.find_one({
-        "_id": ObjectId(device_id),
-        "user_id": current_user.id
-    })
+    docs = [_new_device_doc(device_data, current_user.id) for device_data in bulk.devices]
+    for doc in docs:
+        doc["_id"] = ObjectId()
     
-    if not device:
+    errors = {}
+    try:
+        await db.devices.bulk_write([InsertOne(doc) for doc in docs], ordered=False)
+    except BulkWriteError as e:
+        errors = {err["index"]: err.get("errmsg", "Insert failed") for err in e.details.get("writeErrors", [])}
+    device_index.invalidate(current_user.id)
+    
+    results = [
+        {"index": i, "status": "error", "error": errors[i]} if i in errors
+        else {"index": i, "status": "created", "device_id": str(doc["_id"])}
+        for i, doc in enumerate(docs)
+    ]
+    return {
+        "created": len(docs) - len(errors),
+        "failed": len(errors),
+        "results": results
+    }
+
+@router.patch("/bulk", response_model=dict)
+async def bulk_update_devices(
+    bulk: DeviceBulkUpdate,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Update many devices in one unordered bulk write
+    
+    `updates` patches individual devices by id (ids that match no device are
+    reported as not_found); `filter` + `update` applies the same change to
+    every matching device (e.g. all devices of one crop_type). Both may be
+    combined in one request.
+    """
+    db = get_database()
+    
+    if (bulk.filter is None) != (bulk.update is None):
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Device not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="filter and update must be given together"
+        )
+    if not bulk.updates and bulk.filter is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Nothing to update"
         )
     
-    return Device(
-        id=str(device["_id"]),
-        user_id=device["user_id"],
-        device_name=device["device_name"],
-        location=device["location"],
-        crop_type=device["crop_type"],
-        moisture_threshold=device["moisture_threshold"],
-        is_active=device.get("is_active", True),
-        created_at=device["created_at"],
-        updated_at=device.get("updated_at", device["created_at"])
-    )
+    # Ownership is checked against the cached device index, not per item
+    owned = await device_index.get_user_device_ids(current_user.id)
+    
+    operations = []
+    results = []
+    op_items = {}
+    for i, item in enumerate(bulk.updates):
+        if item.device_id not in owned:
+            results.append({"index": i, "device_id": item.device_id, "status": "not_found"})
+            continue
+        op_items[len(operations)] = len(results)
+        operations.append(UpdateOne(
+            {"_id": ObjectId(item.device_id), "user_id": current_user.id, **NOT_DELETED},
+            {"$set": _update_fields(item)}
+        ))
+        results.append({"index": i, "device_id": item.device_id, "status": "updated"})
+    
+    if operations:
+        try:
+            result = await db.devices.bulk_write(operations, ordered=False)
+            details = result.bulk_api_result
+        except BulkWriteError as e:
+            details = e.details
+        for err in details.get("writeErrors", []):
+            results[op_items[err["index"]]].update(
+                status="error", error=err.get("errmsg", "Update failed")
+            )
+        pending = [results[i] for i in op_items.values() if results[i]["status"] == "updated"]
+        if details.get("nMatched", 0) < len(pending):
+            # Some ids matched nothing (deleted since the index was cached):
+            # look up which of them still exist
+            existing = {
+                str(device["_id"]) async for device in db.devices.find(
+                    {"_id": {"$in": [ObjectId(r["device_id"]) for r in pending]}, "user_id": current_user.id, **NOT_DELETED},
+                    {"_id": 1}
+                )
+            }
+            for r in pending:
+                if r["device_id"] not in existing:
+                    r["status"] = "not_found"
+    
+    filter_result = None
+    if bulk.filter is not None:
+        # Separate write so its matched count is exact
+        try:
+            result = await db.devices.update_many(
+                _filter_query(current_user.id, bulk.filter),
+                {"$set": _update_fields(bulk.update)}
+            )
+            filter_result = {"status": "updated", "matched": result.matched_count}
+        except PyMongoError as e:
+            filter_result = {"status": "error", "matched": 0, "error": str(e)}
+    
+    if operations or filter_result is not None:
+        device_index.invalidate_user(current_user.id)
+        await device_key_index.refresh_user(current_user.id)
+    
+    return {
+        "updated": sum(1 for r in results if r["status"] == "updated"),
+        "results": results,
+        "filter": filter_result
+    }
+
+@router.get("/{device_id}", response_model=Device)
+async def get_device(
+    device_id: str,
+    device: dict = Depends(get_owned_device)
+):
+    """Get a specific device by ID"""
+    return _to_device(device)
 
 @router.put("/{device_id}", response_model=dict)
 async def update_device(
     device_id: str,
     device_update: DeviceUpdate,
-    current_user: User = Depends(get_current_user)
+    device: dict = Depends(get_owned_device)
 ):
     """Update device settings"""
     db = get_database()
     
-    # Verify device belongs to user
-    device = await db.devices.find_one({
-        "_id": ObjectId(device_id),
-        "user_id": current_user.id
-    })
-    
-    if not device:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Device not found"
-        )
-    
     # Build update document (only include provided fields)
-    update_data = {}
-    if device_update.device_name is not None:
-        update_data["device_name"] = device_update.device_name
-    if device_update.location is not None:
-        update_data["location"] = device_update.location
-    if device_update.crop_type is not None:
-        update_data["crop_type"] = device_update.crop_type
-    if device_update.moisture_threshold is not None:
-        update_data["moisture_threshold"] = device_update.moisture_threshold
-    if device_update.is_active is not None:
-        update_data["is_active"] = device_update.is_active
-    
-    update_data["updated_at"] = datetime.utcnow()
+    update_data = _update_fields(device_update)
     
     # Update device
     await db.devices.update_one(
         {"_id": ObjectId(device_id)},
         {"$set": update_data}
     )
+    device_index.invalidate(device["user_id"], device_id)
+    
+    if "api_key_hash" in device:
+        await device_key_index.refresh_device(device_id)
     
     return {"message": "Device updated successfully"}
 
-@router.delete("/{device_id}", response_model=dict)
+@router.post("/{device_id}/api-key", response_model=dict, status_code=status.HTTP_201_CREATED)
+async def create_device_api_key(
+    device_id: str,
+    device: dict = Depends(get_owned_device)
+):
+    """
+    Issue (or rotate) the device's ingestion API key
+    
+    The key is only returned once; send it as the X-Device-Key header on
+    POST /api/sensors/readings. Rotating invalidates the previous key.
+    """
+    db = get_database()
+    
+    api_key, key_hash = device_key_index.generate_key()
+    created_at = datetime.utcnow()
+    
+    await db.devices.update_one(
+        {"_id": ObjectId(device_id)},
+        {"$set": {"api_key_hash": key_hash, "api_key_created_at": created_at, "updated_at": created_at}}
+    )
+    device_index.invalidate(device["user_id"], device_id)
+    await device_key_index.refresh_device(device_id)
+    
+    return {
+        "message": "Device API key created - store it now, it will not be shown again",
+        "device_id": device_id,
+        "api_key": api_key,
+        "created_at": created_at
+    }
+
+@router.delete("/{device_id}/api-key", response_model=dict)
+async def revoke_device_api_key(
+    device_id: str,
+    device: dict = Depends(get_owned_device)
+):
+    """Revoke the device's ingestion API key"""
+    db = get_database()
+    
+    await db.devices.update_one(
+        {"_id": ObjectId(device_id)},
+        {"$unset": {"api_key_hash": "", "api_key_created_at": ""}, "$set": {"updated_at": datetime.utcnow()}}
+    )
+    device_index.invalidate(device["user_id"], device_id)
+    device_key_index.remove(device_id)
+    
+    return {"message": "Device API key revoked"}
+
+@router.delete("/{device_id}", response_model=dict, status_code=status.HTTP_202_ACCEPTED)
 async def delete_device(
     device_id: str,
-    current_user: User = Depends(get_current_user)
+    device: dict = Depends(get_owned_device)
 ):
-    """Delete a device"""
+    """
+    Delete a device
+    
+    The device is marked deleted and disappears immediately; its sensor
+    readings and pump logs are purged in the background once every worker
+    has dropped it from its caches. Track progress at
+    GET /api/devices/{device_id}/purge.
+    """
     db = get_database()
     
-    # Verify device belongs to user
-    device = await db.devices.find_one({
-        "_id": ObjectId(device_id),
-        "user_id": current_user.id
-    })
+    # Mark deleted first: other workers stop accepting readings for the device
+    # when their device and key caches pick up the change
+    now = datetime.utcnow()
+    await db.devices.update_one(
+        {"_id": ObjectId(device_id)},
+        {"$set": {"deleted_at": now, "is_active": False, "updated_at": now}}
+    )
+    device_index.invalidate(device["user_id"], device_id)
+    device_key_index.remove(device_id)
+    auto_control_worker.discard(device_id)
+    pump_analytics.invalidate_device(device_id)
+    
+    # The purge (and final removal of the device document) waits out the
+    # cache refresh intervals
+    await device_purger.schedule(device)
     
-    if not device:
+    return {
+        "message": "Device deleted; associated data is being removed in the background",
+        "device_id": device_id
+    }
+
+@router.get("/{device_id}/purge", response_model=DevicePurgeStatus)
+async def get_device_purge_status(
+    device_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Progress of the background data purge for a deleted device"""
+    job = await device_purger.get_job(device_id, current_user.id)
+    
+    if not job:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Device not found"
+            detail="No deletion in progress for this device"
         )
     
-    # Delete device
-    await db.devices.delete_one({"_id": ObjectId(device_id)})
-    
-    # Also delete associated sensor readings and pump logs
-    await db.sensor_readings.delete_many({"device_id": device_id})
-    await db.pump_logs.delete_many({"device_id": device_id})
-    
-    return {"message": "Device and associated data deleted successfully"}
+    return {"device_id": job.pop("_id"), **job}
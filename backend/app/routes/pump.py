@@ -1,51 +1,50 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, status, Depends, Query, WebSocket, WebSocketDisconnect
+from typing import List, Optional, Union
+import asyncio
 from app.models import (
     PumpControlRequest, 
     PumpAutoRequest, 
     PumpLog, 
+    PumpLogColumns,
     PumpStatus,
+    PumpRuntimeAnalytics,
     User,
     PredictionInput
 )
-from app.auth import get_current_user
+from app.auth import get_current_user, verify_token, get_user_by_email
 from app.database import get_database
 from app.ml_service import ml_service
+from app.rule_engine import device_overrides
 from app.weather_service import weather_service
+from app.pump_events import pump_event_broker
+from app.pump_state import pump_state
+from app.audit_writer import audit_writer
+from app.analytics_service import pump_analytics
+from app.rate_limit import rate_limiter
+from app.device_cache import device_index, get_owned_device
+from app.serialization import ListFormat, PUMP_LOG_FIELDS, PUMP_LOG_PROJECTION, pump_log_rows, list_response
 from datetime import datetime, timedelta
-from bson import ObjectId
 
 router = APIRouter(prefix="/api/pump", tags=["pump"])
 
-# In-memory pump status cache (in production, use Redis or database)
-pump_status_cache = {}
-
 @router.post("/control", response_model=dict)
 async def control_pump(
     request: PumpControlRequest,
     current_user: User = Depends(get_current_user)
 ):
     """Manual pump control (ON/OFF)"""
-    db = get_database()
-    
     # Verify device belongs to user
-    device = await db.devices.find_one({
-        "_id": ObjectId(request.device_id),
-        "user_id": current_user.id
-    })
-    
-    if not device:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Device not found"
-        )
+    await device_index.get_owned(current_user.id, request.device_id)
     
     # Update pump status
-    pump_status_cache[request.device_id] = {
+    state = await pump_state.set(request.device_id, {
         "status": request.action,
         "mode": "manual",
         "timestamp": datetime.utcnow()
-    }
+    })
+    pump_event_broker.publish_status(
+        request.device_id, current_user.id, request.action, "manual", state["timestamp"]
+    )
     
     # Log the pump event
     log_doc = {
@@ -57,7 +56,7 @@ async def control_pump(
         "timestamp": datetime.utcnow()
     }
     
-    await db.pump_logs.insert_one(log_doc)
+    audit_writer.write("pump_logs", log_doc)
     
     return {
         "message": f"Pump turned {request.action}",
@@ -79,19 +78,11 @@ async def auto_pump_control(
     3. Make ML prediction
     4. Decide: Turn ON if (prediction==1 AND rain_probability < threshold)
     """
+    await rate_limiter.check("pump_auto", current_user.id)
     db = get_database()
     
     # Verify device belongs to user
-    device = await db.devices.find_one({
-        "_id": ObjectId(request.device_id),
-        "user_id": current_user.id
-    })
-    
-    if not device:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Device not found"
-        )
+    device = await device_index.get_owned(current_user.id, request.device_id)
     
     # Get latest sensor reading
     latest_reading = await db.sensor_readings.find_one(
@@ -106,7 +97,8 @@ async def auto_pump_control(
         )
     
     # Get current weather
-    weather = await weather_service.get_current_weather(city=device.get("location", "London"))
+    location = device.get("location", "London")
+    weather = await weather_service.get_current_weather(city=location)
     
     if not weather:
         # Use default values if weather unavailable
@@ -114,6 +106,9 @@ async def auto_pump_control(
     else:
         rain_probability = weather.rain_probability
     
+    # Account for rain expected over the next hours (cached forecast only)
+    rain_probability = weather_service.expected_rain_probability(location, rain_probability)
+    
     # Prepare ML prediction input
     prediction_input = PredictionInput(
         soil_moisture=latest_reading["soil_moisture"],
@@ -124,17 +119,20 @@ async def auto_pump_control(
     )
     
     # Get ML prediction
-    prediction = ml_service.predict_irrigation(prediction_input)
+    prediction = ml_service.predict_irrigation(prediction_input, device_overrides(device))
     
     # Determine pump action
     pump_action = "on" if prediction.should_irrigate else "off"
     
     # Update pump status
-    pump_status_cache[request.device_id] = {
+    state = await pump_state.set(request.device_id, {
         "status": pump_action,
         "mode": "auto",
         "timestamp": datetime.utcnow()
-    }
+    })
+    pump_event_broker.publish_status(
+        request.device_id, current_user.id, pump_action, "auto", state["timestamp"]
+    )
     
     # Log the pump event
     log_doc = {
@@ -155,7 +153,7 @@ async def auto_pump_control(
         "timestamp": datetime.utcnow()
     }
     
-    await db.pump_logs.insert_one(log_doc)
+    audit_writer.write("pump_logs", log_doc)
     
     return {
         "message": f"Pump turned {pump_action} (automated)",
@@ -174,48 +172,20 @@ async def auto_pump_control(
 @router.get("/status/{device_id}", response_model=PumpStatus)
 async def get_pump_status(
     device_id: str,
-    current_user: User = Depends(get_current_user)
+    device: dict = Depends(get_owned_device)
 ):
     """Get current pump status for a device"""
-    db = get_database()
-    
-    # Verify device belongs to user
-    device = await db.devices.find_one({
-        "_id": ObjectId(device_id),
-        "user_id": current_user.id
-    })
-    
-    if not device:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Device not found"
-        )
-    
-    # Check cache first
-    if device_id in pump_status_cache:
-        cached = pump_status_cache[device_id]
-        return PumpStatus(
-            device_id=device_id,
-            status=cached["status"],
-            last_updated=cached["timestamp"],
-            mode=cached["mode"]
-        )
-    
-    # Get from latest log
-    latest_log = await db.pump_logs.find_one(
-        {"device_id": device_id},
-        sort=[("timestamp", -1)]
-    )
-    
-    if latest_log:
+    # Shared pump state store (never falls back to scanning pump_logs)
+    state = await pump_state.get(device_id)
+    if state:
         return PumpStatus(
             device_id=device_id,
-            status=latest_log["pump_status"],
-            last_updated=latest_log["timestamp"],
-            mode="auto" if latest_log.get("ml_prediction") else "manual"
+            status=state["status"],
+            last_updated=state["timestamp"],
+            mode=state["mode"]
         )
     
-    # Default status if no logs
+    # Default status if no known state
     return PumpStatus(
         device_id=device_id,
         status="off",
@@ -223,11 +193,100 @@ async def get_pump_status(
         mode="manual"
     )
 
-@router.get("/logs", response_model=List[PumpLog])
+@router.get("/analytics/{device_id}", response_model=PumpRuntimeAnalytics)
+async def get_pump_runtime_analytics(
+    device_id: str,
+    days: int = Query(7, ge=1, le=90, description="Number of days (UTC, including today)"),
+    device: dict = Depends(get_owned_device)
+):
+    """
+    Pump runtime analytics computed server-side
+    
+    Per UTC day: total on-time, number of on cycles and estimated water
+    use (runtime x the device's pump_flow_rate_lpm, or PUMP_FLOW_RATE_LPM).
+    """
+    return await pump_analytics.get_runtime(device, days)
+
+@router.websocket("/ws")
+async def pump_status_stream(
+    websocket: WebSocket,
+    token: str = Query(..., description="JWT access token"),
+    device_id: Optional[str] = Query(None, description="Only stream this device")
+):
+    """
+    Push pump status transitions instead of polling /status/{device_id}
+    
+    Connect with ?token=<JWT> (browsers cannot set headers on WebSockets).
+    With device_id only that device is streamed, otherwise all of the
+    user's devices. Authentication and ownership are checked once per
+    connection, not per update.
+    """
+    try:
+        token_data = verify_token(token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    user = await get_user_by_email(token_data.email)
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    user_id = str(user["_id"])
+    
+    if device_id:
+        try:
+            await device_index.get_owned(user_id, device_id)
+        except HTTPException:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+        topics = [pump_event_broker.device_topic(device_id)]
+    else:
+        topics = [pump_event_broker.user_topic(user_id)]
+    
+    await websocket.accept()
+    queue = pump_event_broker.subscribe(topics)
+    
+    async def wait_for_disconnect():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+    
+    disconnected = asyncio.create_task(wait_for_disconnect())
+    try:
+        # Send the current state so clients don't need an initial poll
+        state = await pump_state.get(device_id) if device_id else None
+        if state:
+            await websocket.send_json({
+                "type": "pump_status",
+                "device_id": device_id,
+                "status": state["status"],
+                "mode": state["mode"],
+                "last_updated": state["timestamp"].isoformat()
+            })
+        
+        while True:
+            next_event = asyncio.create_task(queue.get())
+            done, _ = await asyncio.wait(
+                {next_event, disconnected},
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if disconnected in done:
+                next_event.cancel()
+                break
+            await websocket.send_json(next_event.result())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        disconnected.cancel()
+        pump_event_broker.unsubscribe(queue, topics)
+
+@router.get("/logs", response_model=Union[List[PumpLog], PumpLogColumns])
 async def get_pump_logs(
     device_id: Optional[str] = Query(None, description="Filter by device ID"),
     days: int = Query(7, ge=1, le=90, description="Number of days of history"),
     limit: int = Query(100, ge=1, le=1000),
+    layout: ListFormat = Query("rows", alias="format", description="rows, or columnar (one array per field)"),
     current_user: User = Depends(get_current_user)
 ):
     """Get pump event logs"""
@@ -238,22 +297,11 @@ async def get_pump_logs(
     
     if device_id:
         # Verify device belongs to user
-        device = await db.devices.find_one({
-            "_id": ObjectId(device_id),
-            "user_id": current_user.id
-        })
-        
-        if not device:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Device not found"
-            )
-        
+        await device_index.get_owned(current_user.id, device_id)
         query["device_id"] = device_id
     else:
         # Get all user's devices
-        devices = await db.devices.find({"user_id": current_user.id}).to_list(length=100)
-        device_ids = [str(d["_id"]) for d in devices]
+        device_ids = list(await device_index.get_user_device_ids(current_user.id))
         query["device_id"] = {"$in": device_ids}
     
     # Add date filter
@@ -261,18 +309,7 @@ async def get_pump_logs(
     query["timestamp"] = {"$gte": start_date}
     
     # Get logs
-    cursor = db.pump_logs.find(query).sort("timestamp", -1).limit(limit)
+    cursor = db.pump_logs.find(query, PUMP_LOG_PROJECTION).sort("timestamp", -1).limit(limit)
     logs = await cursor.to_list(length=limit)
     
-    return [
-        PumpLog(
-            id=str(log["_id"]),
-            device_id=log["device_id"],
-            pump_status=log["pump_status"],
-            reason=log["reason"],
-            ml_prediction=log.get("ml_prediction"),
-            weather_data=log.get("weather_data"),
-            timestamp=log["timestamp"]
-        )
-        for log in logs
-    ]
+    return list_response(pump_log_rows(logs), PUMP_LOG_FIELDS, layout)
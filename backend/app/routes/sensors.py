@@ -1,34 +1,55 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
-from typing import List
-from app.models import SensorReadingCreate, SensorReading, User
-from app.auth import get_current_user
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Header
+from fastapi.security import HTTPAuthorizationCredentials
+from typing import List, Optional, Union
+from app.models import SensorReadingCreate, SensorReading, SensorReadingColumns, User
+from app.auth import get_current_user, optional_security
+from app.device_keys import device_key_index
+from app.device_cache import device_index, get_owned_device
 from app.database import get_database
 from app.weather_service import weather_service
+from app.auto_control_service import auto_control_worker
+from app.rate_limit import rate_limiter
+from app.serialization import ListFormat, READING_FIELDS, READING_PROJECTION, reading_rows, list_response
 from datetime import datetime, timedelta
-from bson import ObjectId
 
 router = APIRouter(prefix="/api/sensors", tags=["sensors"])
 
 @router.post("/readings", response_model=dict, status_code=status.HTTP_201_CREATED)
 async def create_sensor_reading(
     reading: SensorReadingCreate,
-    current_user: User = Depends(get_current_user)
+    x_device_key: Optional[str] = Header(None, description="Device API key (alternative to a user token)"),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
 ):
-    """Submit a new sensor reading"""
+    """
+    Submit a new sensor reading
+    
+    Authenticate either with a user bearer token or with the device's own
+    API key in X-Device-Key. Device keys are checked against an in-memory
+    index, so key-authenticated ingestion needs no database reads.
+    Each device is rate limited; excess readings get 429 with Retry-After.
+    """
     db = get_database()
     
-    # Verify device belongs to user
-    device = await db.devices.find_one({
-        "_id": ObjectId(reading.device_id),
-        "user_id": current_user.id
-    })
-    
-    if not device:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Device not found or does not belong to user"
-        )
+    if x_device_key:
+        device = device_key_index.authenticate(x_device_key, reading.device_id)
+        if device is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid device API key"
+            )
+    else:
+        if credentials is None:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authenticated"
+            )
+        current_user = await get_current_user(credentials)
         
+        # Verify device belongs to user
+        device = await device_index.get_owned(current_user.id, reading.device_id)
+    
+    await rate_limiter.check("sensor_readings", reading.device_id)
+    
     # Get weather data for missing sensor values based on device location
     weather_data = await weather_service.get_current_weather(city=device.get("location", "London"))
     
@@ -55,108 +76,68 @@ async def create_sensor_reading(
     # Insert reading
     result = await db.sensor_readings.insert_one(reading_doc)
     
+    # Event-driven auto irrigation (opt-in per device)
+    if device.get("auto_mode"):
+        auto_control_worker.enqueue(device, reading_doc)
+    
     return {
         "message": "Sensor reading recorded successfully",
         "reading_id": str(result.inserted_id)
     }
 
-@router.get("/readings/latest", response_model=List[SensorReading])
+@router.get("/readings/latest", response_model=Union[List[SensorReading], SensorReadingColumns])
 async def get_latest_readings(
     limit: int = Query(10, ge=1, le=100),
+    layout: ListFormat = Query("rows", alias="format", description="rows, or columnar (one array per field)"),
     current_user: User = Depends(get_current_user)
 ):
     """Get latest sensor readings across all user devices"""
     db = get_database()
     
     # Get user's devices
-    devices = await db.devices.find({"user_id": current_user.id}).to_list(length=100)
-    device_ids = [str(d["_id"]) for d in devices]
+    device_ids = list(await device_index.get_user_device_ids(current_user.id))
     
     if not device_ids:
-        return []
+        return list_response([], READING_FIELDS, layout)
     
     # Get latest readings
     cursor = db.sensor_readings.find({
         "device_id": {"$in": device_ids}
-    }).sort("timestamp", -1).limit(limit)
+    }, READING_PROJECTION).sort("timestamp", -1).limit(limit)
     
     readings = await cursor.to_list(length=limit)
     
-    return [
-        SensorReading(
-            id=str(r["_id"]),
-            device_id=r["device_id"],
-            soil_moisture=r.get("soil_moisture", 0.0),
-            temperature=r.get("temperature", 25.0),
-            humidity=r.get("humidity", 50.0),
-            rain_sensor=r.get("rain_sensor", 0),
-            timestamp=r["timestamp"]
-        )
-        for r in readings
-    ]
+    return list_response(reading_rows(readings), READING_FIELDS, layout)
 
-@router.get("/readings/device/{device_id}", response_model=List[SensorReading])
+@router.get("/readings/device/{device_id}", response_model=Union[List[SensorReading], SensorReadingColumns])
 async def get_device_readings(
     device_id: str,
     limit: int = Query(50, ge=1, le=1000),
-    current_user: User = Depends(get_current_user)
+    layout: ListFormat = Query("rows", alias="format", description="rows, or columnar (one array per field)"),
+    device: dict = Depends(get_owned_device)
 ):
     """Get sensor readings for a specific device"""
     db = get_database()
     
-    # Verify device belongs to user
-    device = await db.devices.find_one({
-        "_id": ObjectId(device_id),
-        "user_id": current_user.id
-    })
-    
-    if not device:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Device not found or does not belong to user"
-        )
-    
     # Get readings
     cursor = db.sensor_readings.find({
         "device_id": device_id
-    }).sort("timestamp", -1).limit(limit)
+    }, READING_PROJECTION).sort("timestamp", -1).limit(limit)
     
     readings = await cursor.to_list(length=limit)
     
-    return [
-        SensorReading(
-            id=str(r["_id"]),
-            device_id=r["device_id"],
-            soil_moisture=r.get("soil_moisture", 0.0),
-            temperature=r.get("temperature", 25.0),
-            humidity=r.get("humidity", 50.0),
-            rain_sensor=r.get("rain_sensor", 0),
-            timestamp=r["timestamp"]
-        )
-        for r in readings
-    ]
+    return list_response(reading_rows(readings), READING_FIELDS, layout)
 
-@router.get("/readings/history", response_model=List[SensorReading])
+@router.get("/readings/history", response_model=Union[List[SensorReading], SensorReadingColumns])
 async def get_historical_readings(
     device_id: str,
     days: int = Query(7, ge=1, le=90),
-    current_user: User = Depends(get_current_user)
+    layout: ListFormat = Query("rows", alias="format", description="rows, or columnar (one array per field)"),
+    device: dict = Depends(get_owned_device)
 ):
     """Get historical sensor readings for a device within a date range"""
     db = get_database()
     
-    # Verify device belongs to user
-    device = await db.devices.find_one({
-        "_id": ObjectId(device_id),
-        "user_id": current_user.id
-    })
-    
-    if not device:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Device not found or does not belong to user"
-        )
-    
     # Calculate date range
     end_date = datetime.utcnow()
     start_date = end_date - timedelta(days=days)
@@ -165,19 +146,8 @@ async def get_historical_readings(
     cursor = db.sensor_readings.find({
         "device_id": device_id,
         "timestamp": {"$gte": start_date, "$lte": end_date}
-    }).sort("timestamp", 1)
+    }, READING_PROJECTION).sort("timestamp", 1)
     
     readings = await cursor.to_list(length=10000)
     
-    return [
-        SensorReading(
-            id=str(r["_id"]),
-            device_id=r["device_id"],
-            soil_moisture=r.get("soil_moisture", 0.0),
-            temperature=r.get("temperature", 25.0),
-            humidity=r.get("humidity", 50.0),
-            rain_sensor=r.get("rain_sensor", 0),
-            timestamp=r["timestamp"]
-        )
-        for r in readings
-    ]
+    return list_response(reading_rows(readings), READING_FIELDS, layout)
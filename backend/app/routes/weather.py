@@ -37,16 +37,17 @@ async def get_weather_forecast(
     city: Optional[str] = Query(None, description="City name"),
     lat: Optional[float] = Query(None, description="Latitude"),
     lon: Optional[float] = Query(None, description="Longitude"),
+    hours: int = Query(15, ge=3, le=120, description="Forecast horizon in hours"),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Get 6-hour weather forecast for a location
+    Get the weather forecast (3-hour steps) for a location
     
     Provide either:
     - city: City name
     - lat & lon: Geographic coordinates
     """
-    forecast = await weather_service.get_forecast(city=city, lat=lat, lon=lon)
+    forecast = await weather_service.get_forecast(city=city, lat=lat, lon=lon, hours=hours)
     
     if not forecast:
         raise HTTPException(
@@ -0,0 +1,221 @@
+import sys
+import os
+import json
+import operator
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Default thresholds for the rule-based fallback predictor
+# (overridable per crop_type through RULE_THRESHOLDS_BY_CROP, and per
+# device through its rule_thresholds field)
+DEFAULT_THRESHOLDS: Dict[str, float] = {
+    "critical_moisture": 30.0,
+    "low_moisture": 40.0,
+    "warm_temperature": 25.0,
+    "dry_moisture": 50.0,
+    "hot_temperature": 30.0,
+    "dry_humidity": 40.0,
+}
+
+
+def _load_crop_thresholds() -> Dict[str, Dict[str, float]]:
+    """
+    Per-crop threshold defaults from RULE_THRESHOLDS_BY_CROP, a JSON object
+    of crop_type -> thresholds, e.g. {"rice": {"critical_moisture": 45}}
+    """
+    raw = os.getenv("RULE_THRESHOLDS_BY_CROP", "").strip()
+    if not raw:
+        return {}
+    try:
+        config = json.loads(raw)
+        crops = {
+            crop.strip().casefold(): {
+                key: float(value) for key, value in thresholds.items() if key in DEFAULT_THRESHOLDS
+            }
+            for crop, thresholds in config.items()
+        }
+    except (ValueError, TypeError, AttributeError) as e:
+        print(f"⚠️  Ignoring invalid RULE_THRESHOLDS_BY_CROP: {e}")
+        return {}
+    return {crop: thresholds for crop, thresholds in crops.items() if thresholds}
+
+
+# crop_type (case-insensitive) -> threshold defaults for that crop
+CROP_THRESHOLDS = _load_crop_thresholds()
+
+# Declarative decision table, evaluated top to bottom (first match wins)
+# Each condition is (feature, operator, threshold name)
+DECISION_TABLE = [
+    # Irrigate if soil is critically dry
+    {
+        "when": [("soil_moisture", "<", "critical_moisture")],
+        "predicted_class": 1,
+        "confidence": 0.9,
+    },
+    # Irrigate if soil is dry and it is warm
+    {
+        "when": [
+            ("soil_moisture", "<", "low_moisture"),
+            ("temperature", ">", "warm_temperature"),
+        ],
+        "predicted_class": 1,
+        "confidence": 0.75,
+    },
+    # Irrigate if soil is drying out in hot, dry air
+    {
+        "when": [
+            ("soil_moisture", "<", "dry_moisture"),
+            ("temperature", ">", "hot_temperature"),
+            ("humidity", "<", "dry_humidity"),
+        ],
+        "predicted_class": 1,
+        "confidence": 0.7,
+    },
+]
+DEFAULT_DECISION = {"predicted_class": 0, "confidence": 0.85}
+
+# Comparison operators work on both scalars and NumPy arrays
+_OPERATORS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+
+# Decision codes used to pick recommendation text
+IRRIGATE = 0
+HOLD_RAIN_EXPECTED = 1
+HOLD_RAINING = 2
+NOT_NEEDED = 3
+
+# Interned recommendation strings, indexed by decision code
+RECOMMENDATIONS = tuple(sys.intern(s) for s in (
+    "Irrigation recommended",
+    "Hold irrigation - rain expected",
+    "Hold irrigation - currently raining",
+    "No irrigation needed",
+))
+
+_RAINING_REASON = sys.intern("Rain sensor detected precipitation")
+
+# Reason templates, indexed by decision code: (soil_moisture, rain_probability) -> str
+REASON_TEMPLATES = (
+    "Low soil moisture ({0:.1f}%) and low rain probability ({1:.1f}%)".format,
+    "High rain probability ({1:.1f}%) - natural watering expected".format,
+    lambda soil_moisture, rain_probability: _RAINING_REASON,
+    "Soil moisture adequate ({0:.1f}%)".format,
+)
+
+Threshold = Union[float, np.ndarray]
+
+
+class DecisionTable:
+    """Decision table compiled for scalar and masked NumPy evaluation"""
+
+    def __init__(self, table: List[dict], default: dict):
+        self.rules = [
+            (
+                [(feature, _OPERATORS[op], key) for feature, op, key in rule["when"]],
+                rule["predicted_class"],
+                rule["confidence"],
+            )
+            for rule in table
+        ]
+        self.default_class = default["predicted_class"]
+        self.default_confidence = default["confidence"]
+        self._classes = [predicted_class for _, predicted_class, _ in self.rules]
+        self._confidences = [confidence for _, _, confidence in self.rules]
+
+    def evaluate_one(self, values: Dict[str, float],
+                     thresholds: Optional[Dict[str, float]] = None) -> Tuple[int, float]:
+        """Evaluate a single row; returns (predicted_class, confidence)"""
+        thresholds = thresholds or DEFAULT_THRESHOLDS
+        for conditions, predicted_class, confidence in self.rules:
+            if all(op(values[feature], thresholds[key]) for feature, op, key in conditions):
+                return predicted_class, confidence
+        return self.default_class, self.default_confidence
+
+    def evaluate(self, columns: Dict[str, np.ndarray],
+                 thresholds: Optional[Dict[str, Threshold]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Evaluate the table over whole columns with boolean masks
+        Returns: (predicted_classes, confidences) arrays
+        """
+        thresholds = thresholds or DEFAULT_THRESHOLDS
+        masks = []
+        for conditions, _, _ in self.rules:
+            mask = None
+            for feature, op, key in conditions:
+                matched = op(columns[feature], thresholds[key])
+                mask = matched if mask is None else mask & matched
+            masks.append(mask)
+        # np.select picks the first matching mask, like the if/elif chain
+        predicted_classes = np.select(masks, self._classes, self.default_class)
+        confidences = np.select(masks, self._confidences, self.default_confidence)
+        return predicted_classes.astype(int), confidences.astype(float)
+
+
+def device_overrides(device: dict) -> Optional[Dict[str, float]]:
+    """
+    Threshold overrides for a device document: its crop_type defaults with
+    the device's own rule_thresholds on top (None when neither is set)
+    """
+    crop = CROP_THRESHOLDS.get(str(device.get("crop_type") or "").strip().casefold())
+    own = device.get("rule_thresholds")
+    if not crop:
+        return own
+    if not own:
+        return crop
+    return {**crop, **{key: value for key, value in own.items() if value is not None}}
+
+
+def device_thresholds(overrides: Optional[Dict[str, float]]) -> Dict[str, float]:
+    """DEFAULT_THRESHOLDS with one device's overrides (see device_overrides) applied"""
+    if not overrides:
+        return DEFAULT_THRESHOLDS
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    for key, value in overrides.items():
+        if key in thresholds and value is not None:
+            thresholds[key] = float(value)
+    return thresholds
+
+
+def thresholds_for_devices(overrides: Sequence[Optional[Dict[str, float]]]) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Expand per-row device threshold overrides into one threshold array per
+    key (None when no row overrides anything, i.e. the defaults apply)
+    """
+    if not any(overrides):
+        return None
+    thresholds = {
+        key: np.full(len(overrides), value, dtype=float)
+        for key, value in DEFAULT_THRESHOLDS.items()
+    }
+    for row, device_overrides in enumerate(overrides):
+        if not device_overrides:
+            continue
+        for key, value in device_overrides.items():
+            if key in thresholds and value is not None:
+                thresholds[key][row] = value
+    return thresholds
+
+
+def decision_codes(predicted_classes: np.ndarray, should_irrigate: np.ndarray,
+                   rain_probability: np.ndarray, rain_threshold: float) -> np.ndarray:
+    """Map final decisions to recommendation template codes"""
+    return np.select(
+        [
+            should_irrigate,
+            (predicted_classes == 1) & (rain_probability >= rain_threshold),
+            predicted_classes == 1,
+        ],
+        [IRRIGATE, HOLD_RAIN_EXPECTED, HOLD_RAINING],
+        NOT_NEEDED,
+    )
+
+
+def describe(code: int, soil_moisture: float, rain_probability: float) -> Tuple[str, str]:
+    """Render (recommendation, reason) for a decision code"""
+    return RECOMMENDATIONS[code], REASON_TEMPLATES[code](soil_moisture, rain_probability)
+
+
+# Compiled table used by MLService
+decision_table = DecisionTable(DECISION_TABLE, DEFAULT_DECISION)
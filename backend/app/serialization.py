@@ -0,0 +1,74 @@
+from typing import Dict, Any, Iterable, List, Literal
+from fastapi.responses import ORJSONResponse
+
+# Response layouts for large list endpoints:
+#   rows     - list of objects, same shape as the route's response_model
+#   columnar - one array per field ({"timestamp": [...], "humidity": [...]}),
+#              ready to hand to chart series without reshaping
+ListFormat = Literal["rows", "columnar"]
+
+# Sensor reading fields in SensorReading order
+READING_FIELDS = ("soil_moisture", "temperature", "humidity", "rain_sensor", "id", "device_id", "timestamp")
+READING_PROJECTION = {"device_id": 1, "soil_moisture": 1, "temperature": 1, "humidity": 1, "rain_sensor": 1, "timestamp": 1}
+
+PUMP_LOG_FIELDS = ("id", "device_id", "pump_status", "reason", "ml_prediction", "weather_data", "timestamp")
+PUMP_LOG_PROJECTION = {
+    "device_id": 1, "pump_status": 1, "reason": 1, "ml_prediction": 1, "weather_data": 1, "timestamp": 1
+}
+
+def _rain_sensor(value: Any) -> int:
+    """
+    Coerce a stored rain_sensor like SensorReading validation did: integral
+    numbers or numeric strings only (1.0 -> 1, 0.5 is rejected rather
+    than truncated), 0 or 1
+    """
+    if isinstance(value, str) and value.strip().lstrip("+-").isdigit():
+        value = int(value)
+    elif isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if not isinstance(value, int) or value not in (0, 1):
+        raise ValueError(f"Invalid rain_sensor value: {value!r}")
+    return int(value)
+
+def reading_rows(docs: Iterable[dict]) -> List[Dict[str, Any]]:
+    """SensorReading-shaped dicts straight from projected documents (no model instances)"""
+    return [
+        {
+            "soil_moisture": float(r.get("soil_moisture", 0.0)),
+            "temperature": float(r.get("temperature", 25.0)),
+            "humidity": float(r.get("humidity", 50.0)),
+            "rain_sensor": _rain_sensor(r.get("rain_sensor", 0)),
+            "id": str(r["_id"]),
+            "device_id": r["device_id"],
+            "timestamp": r["timestamp"]
+        }
+        for r in docs
+    ]
+
+def pump_log_rows(docs: Iterable[dict]) -> List[Dict[str, Any]]:
+    """PumpLog-shaped dicts straight from projected documents"""
+    return [
+        {
+            "id": str(log["_id"]),
+            "device_id": log["device_id"],
+            "pump_status": log["pump_status"],
+            "reason": log["reason"],
+            "ml_prediction": log.get("ml_prediction"),
+            "weather_data": log.get("weather_data"),
+            "timestamp": log["timestamp"]
+        }
+        for log in docs
+    ]
+
+def rows_to_columns(rows: List[Dict[str, Any]], fields: Iterable[str]) -> Dict[str, list]:
+    """Transpose row dicts into parallel arrays"""
+    return {field: [row[field] for row in rows] for field in fields}
+
+def list_response(rows: List[Dict[str, Any]], fields: Iterable[str], layout: ListFormat) -> ORJSONResponse:
+    """
+    Encode prepared rows with orjson, bypassing response_model validation
+    and the standard JSON encoder (the rows already match the model)
+    """
+    if layout == "columnar":
+        return ORJSONResponse(rows_to_columns(rows, fields))
+    return ORJSONResponse(rows)
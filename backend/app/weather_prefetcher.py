@@ -0,0 +1,89 @@
+import asyncio
+import os
+import time
+from typing import Dict, Any, Optional
+from dotenv import load_dotenv
+from app.database import get_database
+from app.weather_service import weather_service
+
+load_dotenv()
+
+class WeatherPrefetcher:
+    """
+    Keeps weather for every active device location warm.
+
+    Each cycle collects the distinct locations of active devices and
+    refreshes those whose cached current weather (or forecast) would go
+    stale before the next cycle, so request paths hit a warm cache instead
+    of paying provider latency after every expiry. Refreshes go through
+    WeatherService's single-flight table with bounded concurrency and
+    spaced starts.
+    """
+    def __init__(self):
+        # 0 disables the prefetcher
+        self.interval = float(os.getenv("WEATHER_PREFETCH_INTERVAL_SECONDS", 60))
+        self.concurrency = int(os.getenv("WEATHER_PREFETCH_CONCURRENCY", 4))
+        self.spacing = float(os.getenv("WEATHER_PREFETCH_SPACING_SECONDS", 0.2))
+        self.include_forecast = os.getenv("WEATHER_PREFETCH_FORECAST", "true").lower() == "true"
+        self._task: Optional[asyncio.Task] = None
+        self.cycles = 0
+        self.failures = 0
+        self.last_cycle: Dict[str, Any] = {}
+
+    def start(self):
+        """Start the background prefetcher (only useful with a real API key)"""
+        if self.interval > 0 and weather_service.api_key and self._task is None:
+            self._task = asyncio.create_task(self._run())
+            print(f"🌦️ Weather prefetch scheduled every {self.interval:g}s")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_cycle()
+            except Exception as e:
+                self.failures += 1
+                print(f"❌ Weather prefetch cycle failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def run_cycle(self) -> Dict[str, Any]:
+        """Refresh every active location that would expire before the next cycle"""
+        started = time.perf_counter()
+        db = get_database()
+        locations = await db.devices.distinct("location", {"is_active": {"$ne": False}})
+        # Anything going stale before the next cycle (plus one refresh's worth of slack)
+        ahead = self.interval + 30
+        refreshed = await weather_service.prefetch(
+            [loc for loc in locations if loc],
+            ahead_seconds=ahead,
+            concurrency=self.concurrency,
+            spacing_seconds=self.spacing,
+            include_forecast=self.include_forecast
+        )
+        self.cycles += 1
+        self.last_cycle = {
+            "locations": len(locations),
+            "refreshed": refreshed,
+            "seconds": round(time.perf_counter() - started, 3)
+        }
+        return self.last_cycle
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "interval_seconds": self.interval,
+            "cycles": self.cycles,
+            "failures": self.failures,
+            "last_cycle": self.last_cycle
+        }
+
+# Global instance
+weather_prefetcher = WeatherPrefetcher()
@@ -1,13 +1,28 @@
+import asyncio
 import httpx
+import importlib.util
 import unicodedata
-from typing import Optional, List, Dict, Tuple, Any
+from typing import Optional, List, Dict, Tuple, Any, Awaitable, Callable, Iterable
 from datetime import datetime, timedelta
 import os
+import time
 from dotenv import load_dotenv
 from app.models import WeatherData, ForecastData
+from app.cache import TTLCache, StaleWhileRevalidateCache
+from app.circuit_breaker import CircuitBreaker
+from app.locations import normalize_city, geohash_encode, geohash_center
+from app.weather_store import create_weather_store
 
 load_dotenv()
 
+# Cached in place of data when the provider fails (negative caching)
+PROVIDER_ERROR = object()
+
+GEOHASH_PREFIX = "gh:"
+
+# OpenWeather's forecast resolution
+FORECAST_STEP_HOURS = 3
+
 class WeatherService:
     def __init__(self):
         self.api_key = os.getenv("OPENWEATHER_API_KEY")
@@ -15,10 +30,270 @@ class WeatherService:
         if self.api_key == "your-openweathermap-api-key-here" or not self.api_key:
             self.api_key = None
             
-        self.base_url = "https://api.openweathermap.org/data/2.5"
-        # Cache structure: location_key -> (timestamp_utc, data)
-        self.cache: Dict[str, Tuple[datetime, Any]] = {} 
-        self.cache_duration = 5  # minutes
+        self.base_url = os.getenv("OPENWEATHER_BASE_URL", "https://api.openweathermap.org/data/2.5")
+        # location_key -> WeatherData (or PROVIDER_ERROR); bounded LRU with
+        # per-entry TTL, expired entries served while a refresh runs
+        self.cache = StaleWhileRevalidateCache(
+            max_entries=int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", 5000)),
+            ttl_seconds=float(os.getenv("WEATHER_CACHE_TTL_SECONDS", 300)),
+            stale_seconds=float(os.getenv("WEATHER_CACHE_STALE_SECONDS", 600))
+        )
+        self.negative_ttl = float(os.getenv("WEATHER_NEGATIVE_TTL_SECONDS", 60))
+        # (kind, location_key) whose last refresh failed -> no refresh until it expires
+        self._backoff = TTLCache(
+            max_entries=int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", 5000)),
+            ttl_seconds=self.negative_ttl
+        )
+        # Coordinates within one geohash cell share a cache entry (5 ~ 4.9 km cells)
+        self.geohash_precision = int(os.getenv("WEATHER_GEOHASH_PRECISION", 5))
+        # Concurrent provider fetches in get_current_weather_many
+        self.batch_concurrency = int(os.getenv("WEATHER_BATCH_CONCURRENCY", 8))
+        # Background refreshes of stale entries running at once (all callers)
+        self._revalidate_slots = asyncio.Semaphore(int(os.getenv("WEATHER_REVALIDATE_CONCURRENCY", 8)))
+        # location_key -> full forecast series; expires at the next 3-hour step
+        self.forecast_cache = StaleWhileRevalidateCache(
+            max_entries=int(os.getenv("WEATHER_FORECAST_CACHE_MAX_ENTRIES", 2000)),
+            ttl_seconds=FORECAST_STEP_HOURS * 3600,
+            stale_seconds=float(os.getenv("WEATHER_FORECAST_STALE_SECONDS", 3600))
+        )
+        self.forecast_publish_offset = float(os.getenv("WEATHER_FORECAST_PUBLISH_OFFSET_SECONDS", 600))
+        # Hours of cached forecast considered by auto control (0 = current weather only)
+        self.rain_outlook_hours = int(os.getenv("RAIN_OUTLOOK_HOURS", 6))
+        
+        # Shared HTTP client settings (connections are reused across requests)
+        self.timeout = httpx.Timeout(
+            float(os.getenv("WEATHER_READ_TIMEOUT_SECONDS", 5.0)),
+            connect=float(os.getenv("WEATHER_CONNECT_TIMEOUT_SECONDS", 3.0))
+        )
+        max_connections = int(os.getenv("WEATHER_MAX_CONNECTIONS", 20))
+        # Fewer keep-alive slots than connections makes bursts close and
+        # reopen a socket for nearly every request
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=int(os.getenv("WEATHER_MAX_KEEPALIVE_CONNECTIONS", max_connections)),
+            keepalive_expiry=float(os.getenv("WEATHER_KEEPALIVE_SECONDS", 60))
+        )
+        self.http2 = os.getenv("WEATHER_HTTP2", "false").lower() == "true"
+        self._client: Optional[httpx.AsyncClient] = None
+        
+        # Second tier shared by workers / restarts (WEATHER_STORE_BACKEND)
+        self.store = create_weather_store()
+
+        # Fail fast while the provider is down or the key is rejected/throttled
+        self.breaker = CircuitBreaker(
+            "Weather provider",
+            failure_threshold=int(os.getenv("WEATHER_BREAKER_FAILURE_THRESHOLD", 5)),
+            reset_timeout=float(os.getenv("WEATHER_BREAKER_RESET_SECONDS", 30)),
+            max_reset_timeout=float(os.getenv("WEATHER_BREAKER_MAX_RESET_SECONDS", 300)),
+            probe_timeout=self.timeout.connect + self.timeout.read
+        )
+        # (kind, location_key) -> last successful provider result, served
+        # when the provider fails after the regular caches have expired
+        self.last_good = TTLCache(
+            max_entries=int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", 5000)),
+            ttl_seconds=float(os.getenv("WEATHER_LAST_GOOD_MAX_AGE_SECONDS", 21600))
+        )
+        
+        # Single-flight: (kind, location_key) -> provider fetch in progress
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self.provider_calls = 0
+        self.coalesced = 0
+        self.revalidations = 0
+        self.negative_cached = 0
+        self.backed_off = 0
+
+    async def start(self):
+        """Open the pooled HTTP client (called from the app lifespan)"""
+        if self._client is not None:
+            return
+        http2 = self.http2
+        if http2 and importlib.util.find_spec("h2") is None:
+            print("⚠️ WEATHER_HTTP2 is set but the 'h2' package is not installed (pip install httpx[http2]). Using HTTP/1.1.")
+            http2 = False
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=self.timeout,
+            limits=self.limits,
+            http2=http2
+        )
+        try:
+            await self.store.setup()
+        except Exception as e:
+            print(f"❌ Weather store ({self.store.backend}) setup failed: {e}")
+
+    async def stop(self):
+        """Close pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        await self.store.close()
+
+    async def _get(self, path: str, params: Dict[str, Any]) -> httpx.Response:
+        """GET from the provider over the shared connection pool"""
+        if self._client is None:
+            # Used outside the app lifespan (scripts, one-off jobs)
+            await self.start()
+        self.provider_calls += 1
+        return await self._client.get(path, params=params)
+
+    def _location_key(self, city: Optional[str], lat: Optional[float], lon: Optional[float]) -> str:
+        """
+        Normalized cache / single-flight key for a location query: city
+        names are resolved through the alias table ("Pune, IN" -> "pune,in"),
+        coordinates are snapped to a geohash cell ("gh:tek4v")
+        """
+        if city and city.strip():
+            key = normalize_city(city)
+            if key:
+                return key
+        if lat is not None and lon is not None:
+            return GEOHASH_PREFIX + geohash_encode(lat, lon, self.geohash_precision)
+        return "london,gb" # Default fallback
+
+    def _query_params(self, location: str) -> Dict[str, Any]:
+        """Provider query for a location key (the cell centre for coordinates)"""
+        params = {
+            "appid": self.api_key,
+            "units": "metric"
+        }
+        if location.startswith(GEOHASH_PREFIX):
+            lat, lon = geohash_center(location[len(GEOHASH_PREFIX):])
+            params["lat"] = str(round(lat, 4))
+            params["lon"] = str(round(lon, 4))
+        else:
+            params["q"] = location
+        return params
+
+    def _start_fetch(self, key: Tuple[str, str], fetch: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """Return the fetch in flight for key, starting one if there is none"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fetch())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return task
+
+    async def _single_flight(self, key: Tuple[str, str], fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fetch() once per key at a time: concurrent callers with the same
+        key await the fetch already in flight instead of starting their own
+        """
+        # Shielded so a cancelled caller does not cancel the shared fetch
+        return await asyncio.shield(self._start_fetch(key, fetch))
+
+    def _revalidate(self, key: Tuple[str, str], fetch: Callable[[], Awaitable[Any]]):
+        """Refresh an entry in the background (at most one refresh per key, none while backing off)"""
+        if key not in self._inflight and self._backoff.peek(key) is None:
+            self.revalidations += 1
+            self._start_fetch(key, lambda: self._bounded_revalidation(fetch))
+
+    async def _bounded_revalidation(self, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """Queue a background refresh for a revalidation slot"""
+        async with self._revalidate_slots:
+            return await fetch()
+
+    async def _store_get(self, kind: str, location: str, cache: StaleWhileRevalidateCache,
+                         min_fresh: float = 0.0) -> Optional[Tuple[Any, bool]]:
+        """
+        Look a key up in the second tier; a hit is copied into the
+        in-memory cache with its remaining lifetime. Returns (value, fresh),
+        where fresh means fresh for more than min_fresh seconds
+        """
+        try:
+            stored = await self.store.get(f"{kind}:{location}")
+        except Exception as e:
+            self.store.errors += 1
+            print(f"❌ Weather store read failed: {e}")
+            return None
+        if stored is None:
+            return None
+        data, fresh_until = stored
+        if kind == "forecast":
+            value = [ForecastData.model_validate(item) for item in data]
+        else:
+            value = WeatherData.model_validate(data)
+        remaining = fresh_until - time.time()
+        cache.set(location, value, remaining)
+        return value, remaining > min_fresh
+
+    async def _store_put(self, kind: str, location: str, value: Any, fresh_seconds: float,
+                         cache: StaleWhileRevalidateCache):
+        if kind == "forecast":
+            data = [item.model_dump(mode="json") for item in value]
+        else:
+            data = value.model_dump(mode="json")
+        try:
+            await self.store.set(f"{kind}:{location}", data, fresh_seconds, cache.stale_seconds)
+        except Exception as e:
+            self.store.errors += 1
+            print(f"❌ Weather store write failed: {e}")
+
+    def _record_response(self, status_code: int):
+        """Feed a provider response to the circuit breaker"""
+        if status_code in (401, 429):
+            # Rejected or throttled key - retrying right away cannot help
+            self.breaker.trip()
+        elif status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def _fallback(self, kind: str, location: str, stored: Optional[Tuple[Any, bool]]) -> Any:
+        """Stale second-tier copy, else last-known-good data, else None (mock)"""
+        if stored is not None:
+            return stored[0]
+        return self.last_good.get((kind, location))
+
+    def _cache_failure(self, kind: str, cache: StaleWhileRevalidateCache, location: str, fallback: Any):
+        """
+        Record a failed provider fetch. With nothing to serve, the failure
+        is negative-cached. Otherwise the older value (the stale in-memory
+        entry, or else the stale / last-known-good fallback) keeps being
+        served and background refreshes of it back off for negative_ttl.
+        """
+        cached = cache.peek(location)
+        if cached is None or cached is PROVIDER_ERROR:
+            if fallback is None:
+                cache.set(location, PROVIDER_ERROR, self.negative_ttl)
+                self.negative_cached += 1
+                return
+            # Already stale: served from memory, refreshed once the back-off ends
+            cache.set(location, fallback, 0)
+        self._backoff.set((kind, location), True)
+        self.backed_off += 1
+
+    async def get_current_weather_many(self, locations: Iterable[str],
+                                       concurrency: Optional[int] = None) -> Dict[str, WeatherData]:
+        """
+        Current weather for many city names, as {location: WeatherData}.
+        Locations are deduplicated by cache key and served from the cache
+        where possible; only the misses are fetched, at most `concurrency`
+        at a time over the pooled client. Stale entries are returned at once
+        and refreshed in the background, bounded by WEATHER_REVALIDATE_CONCURRENCY.
+        (OpenWeather's group endpoint takes city ids rather than names, so
+        misses are fetched one by one.)
+        """
+        by_key: Dict[str, List[str]] = {}
+        for location in locations:
+            by_key.setdefault(self._location_key(location, None, None), []).append(location)
+        
+        semaphore = asyncio.Semaphore(concurrency or self.batch_concurrency)
+        results: Dict[str, WeatherData] = {}
+        
+        async def resolve(key: str, names: List[str]):
+            cached, fresh = self.cache.lookup(key)
+            if fresh and cached is not PROVIDER_ERROR:
+                weather = cached
+            else:
+                async with semaphore:
+                    weather = await self.get_current_weather(city=names[0])
+            for name in names:
+                results[name] = weather
+        
+        await asyncio.gather(*(resolve(key, names) for key, names in by_key.items()))
+        return results
 
     async def get_current_weather(self, city: Optional[str] = None, lat: Optional[float] = None, lon: Optional[float] = None) -> WeatherData:
         """
@@ -26,21 +301,20 @@ class WeatherService:
         Fully async implementation using httpx.
         """
         # 1. Normalize Cache Key
-        if city and city.strip():
-            location = city.strip().lower()
-        elif lat is not None and lon is not None:
-            location = f"{lat},{lon}"
-        else:
-            location = "london" # Default fallback
+        location = self._location_key(city, lat, lon)
             
         print(f"🌍 Weather Request - City: '{city}' -> Key: '{location}'")
 
-        # 2. Check Cache
-        if location in self.cache:
-            timestamp, data = self.cache[location]
-            if datetime.utcnow() - timestamp < timedelta(minutes=self.cache_duration):
-                print(f"ℹ️ Returning Cached Data for '{location}'")
-                return data
+        # 2. Check Cache (stale entries are served while a refresh runs)
+        cached, fresh = self.cache.lookup(location)
+        if cached is not None and not fresh:
+            self._revalidate(
+                ("current", location),
+                lambda: self._fetch_current(location, self._query_params(location))
+            )
+        if cached is not None and cached is not PROVIDER_ERROR:
+            print(f"ℹ️ Returning {'Cached' if fresh else 'stale'} Data for '{location}'")
+            return cached
 
         # 3. Prepare Mock Data (Fallback)
         # Generate semi-realistic data based on city name hash
@@ -74,25 +348,38 @@ class WeatherService:
             print(f"⚠️ API Key missing. Returning dynamic mock weather for {location}: {mock_temp}°C")
             return mock_data
 
-        # 4. Try Real API (Async)
-        try:
-            url = f"{self.base_url}/weather"
-            params = {
-                "appid": self.api_key,
-                "units": "metric"
-            }
-            
-            # Robust Logic: Only add 'q' if valid city string
-            if city and city.strip():
-                params["q"] = city.strip()
-            elif lat is not None and lon is not None:
-                params["lat"] = str(lat)
-                params["lon"] = str(lon)
-            else:
-                params["q"] = "London"
+        if cached is PROVIDER_ERROR:
+            # The provider failed recently - don't retry on every request
+            return mock_data
 
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(url, params=params)
+        # 4. Try Real API (Async), one call per location however many callers miss
+        weather_data = await self._single_flight(
+            ("current", location),
+            lambda: self._fetch_current(location, self._query_params(location))
+        )
+        return weather_data if weather_data is not None else mock_data
+
+    async def _fetch_current(self, location: str, params: Dict[str, Any],
+                             min_fresh: float = 0.0) -> Optional[WeatherData]:
+        """
+        Second tier, then the provider; caches the result. None means use the mock.
+        A stored entry expiring within min_fresh seconds counts as a miss (prefetch).
+        """
+        stored = await self._store_get("current", location, self.cache, min_fresh)
+        if stored is not None and stored[1]:
+            return stored[0]
+        if not self.breaker.allow_request():
+            # Circuit open: no network wait. Older data is kept in memory (with
+            # refreshes backed off); nothing is negative-cached, so a miss goes
+            # to the provider as soon as the circuit closes
+            fallback = self._fallback("current", location, stored)
+            if fallback is not None:
+                self._cache_failure("current", self.cache, location, fallback)
+            return fallback
+        response = None
+        try:
+            response = await self._get("/weather", params)
+            self._record_response(response.status_code)
             
             if response.status_code == 200:
                 data = response.json()
@@ -123,71 +410,143 @@ class WeatherService:
                 )
                 
                 # Update Cache
-                self.cache[location] = (datetime.utcnow(), weather_data)
+                self.cache.set(location, weather_data)
+                self._backoff.pop(("current", location))
+                self.last_good.set(("current", location), weather_data)
+                await self._store_put("current", location, weather_data, self.cache.ttl_seconds, self.cache)
                 print(f"✅ Cached new data for '{location}'")
                 return weather_data
             
             elif response.status_code == 401:
                 print(f"⚠️ API Key Invalid or Not Active code 401. (Keys make take 10-20 min to activate). Using mock.")
-                return mock_data
             else:
                 print(f"❌ Weather API received status {response.status_code}. Using mock.")
-                return mock_data
 
         except httpx.RequestError as e:
+            self.breaker.record_failure()
             print(f"❌ Weather API connection failed: {e}. Using mock.")
-            return mock_data
+        except asyncio.CancelledError:
+            if response is None:
+                self.breaker.release_probe()
+            raise
         except Exception as e:
+            if response is None:
+                self.breaker.record_failure()
             print(f"❌ Unexpected error in weather service: {e}. Using mock.")
-            return mock_data
+        
+        # Serve stale or last-known-good data rather than the mock
+        fallback = self._fallback("current", location, stored)
+        self._cache_failure("current", self.cache, location, fallback)
+        return fallback
+
+    def _forecast_ttl(self) -> float:
+        """Seconds until the provider's next 3-hour forecast step (plus a publish offset)"""
+        now = datetime.utcnow()
+        step = timedelta(hours=FORECAST_STEP_HOURS)
+        period_start = now.replace(hour=now.hour - now.hour % FORECAST_STEP_HOURS, minute=0, second=0, microsecond=0)
+        next_step = period_start + step + timedelta(seconds=self.forecast_publish_offset)
+        if next_step - step > now:
+            # Still inside the publish offset of the current step
+            next_step -= step
+        return max((next_step - now).total_seconds(), 60.0)
 
-    async def get_forecast(self, city: Optional[str] = None, lat: Optional[float] = None, lon: Optional[float] = None) -> List[ForecastData]:
+    @staticmethod
+    def _slice_forecast(series: List[ForecastData], hours: int) -> List[ForecastData]:
+        """Steps starting within the next `hours` from one stored series"""
+        now = datetime.utcnow()
+        horizon = now + timedelta(hours=hours)
+        return [f for f in series if now < f.time <= horizon] or series[:1]
+
+    def expected_rain_probability(self, location: str, current: float) -> float:
         """
-        Get forecast data with mock fallback.
-        Fully async implementation using httpx.
+        Rain probability for auto control: the current value, raised to the
+        highest cached forecast value over the next RAIN_OUTLOOK_HOURS
         """
+        if self.rain_outlook_hours <= 0:
+            return current
+        outlook = self.get_cached_rain_outlook(location, self.rain_outlook_hours)
+        return current if outlook is None else max(current, outlook)
+
+    def get_cached_rain_outlook(self, location: str, hours: int) -> Optional[float]:
+        """
+        Highest forecast rain probability over the next `hours`, from the
+        forecast cache only (None if the location's forecast isn't cached).
+        A pure cache read: the prefetcher keeps active locations' forecasts
+        warm, so decisions never start provider calls.
+        """
+        key = self._location_key(location, None, None)
+        series = self.forecast_cache.peek(key)
+        if series is None or series is PROVIDER_ERROR:
+            return None
+        now = datetime.utcnow()
+        horizon = now + timedelta(hours=hours)
+        step = timedelta(hours=FORECAST_STEP_HOURS)
+        window = [f.rain_probability for f in series if f.time + step > now and f.time <= horizon]
+        return max(window) if window else None
+
+    async def get_forecast(self, city: Optional[str] = None, lat: Optional[float] = None, lon: Optional[float] = None,
+                           hours: int = 15) -> List[ForecastData]:
+        """
+        Get forecast data for the next `hours` with caching and mock fallback.
+        One full provider series is cached per location until the next
+        3-hour step, and every horizon is sliced from it.
+        """
+        location = self._location_key(city, lat, lon)
+        
+        cached, fresh = self.forecast_cache.lookup(location)
+        if cached is not None and not fresh:
+            self._revalidate(
+                ("forecast", location),
+                lambda: self._fetch_forecast(location, self._query_params(location))
+            )
+        if cached is not None and cached is not PROVIDER_ERROR:
+            return self._slice_forecast(cached, hours)
+        
         # Prepare Mock Forecast with Dynamic Data
-        location = city.strip().lower() if city and city.strip() else "london"
         seed_val = sum(ord(c) for c in location)
         
         mock_forecast = []
         base_time = datetime.utcnow()
-        for i in range(5):
+        for i in range(max(1, -(-hours // FORECAST_STEP_HOURS))):
             # Vary temp slightly over time
             f_temp = 15.0 + (seed_val % 20) + (i * 0.5) if i % 2 == 0 else 15.0 + (seed_val % 20) - 0.5
             mock_forecast.append(ForecastData(
-                time=base_time + timedelta(hours=3 * (i + 1)),
+                time=base_time + timedelta(hours=FORECAST_STEP_HOURS * (i + 1)),
                 temperature=round(f_temp, 1),
                 rain_probability=round((seed_val * i) % 100, 1),
                 description="Partly Cloudy (Mock)"
             ))
 
-        if not self.api_key:
+        if not self.api_key or cached is PROVIDER_ERROR:
             return mock_forecast
 
-        try:
-            url = f"{self.base_url}/forecast"
-            params = {
-                "appid": self.api_key,
-                "units": "metric",
-                "cnt": 5  # Limits response size
-            }
-            if city and city.strip():
-                params["q"] = city.strip()
-            elif lat is not None and lon is not None:
-                params["lat"] = str(lat)
-                params["lon"] = str(lon)
-            else:
-                params["q"] = "London"
+        series = await self._single_flight(
+            ("forecast", location),
+            lambda: self._fetch_forecast(location, self._query_params(location))
+        )
+        return self._slice_forecast(series, hours) if series else mock_forecast
 
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(url, params=params)
+    async def _fetch_forecast(self, location: str, params: Dict[str, Any],
+                              min_fresh: float = 0.0) -> Optional[List[ForecastData]]:
+        """Fetch and cache the full forecast series (second tier first); None means use the mock"""
+        stored = await self._store_get("forecast", location, self.forecast_cache, min_fresh)
+        if stored is not None and stored[1]:
+            return stored[0]
+        if not self.breaker.allow_request():
+            fallback = self._fallback("forecast", location, stored)
+            if fallback is not None:
+                self._cache_failure("forecast", self.forecast_cache, location, fallback)
+            return fallback
+        response = None
+        try:
+            response = await self._get("/forecast", params)
+            self._record_response(response.status_code)
 
             if response.status_code == 200:
                 data = response.json()
                 forecast_list = []
                 
-                for item in data.get("list", [])[:5]:
+                for item in data.get("list", []):
                     forecast_list.append(ForecastData(
                         # Use utcfromtimestamp for correct parsing
                         time=datetime.utcfromtimestamp(item["dt"]),
@@ -195,17 +554,92 @@ class WeatherService:
                         rain_probability=item.get("pop", 0) * 100,
                         description=item["weather"][0]["description"]
                     ))
-                return forecast_list
+                if forecast_list:
+                    ttl = self._forecast_ttl()
+                    self.forecast_cache.set(location, forecast_list, ttl)
+                    self._backoff.pop(("forecast", location))
+                    self.last_good.set(("forecast", location), forecast_list)
+                    await self._store_put("forecast", location, forecast_list, ttl, self.forecast_cache)
+                    return forecast_list
+                print(f"❌ Forecast API returned no data for '{location}'. Using mock.")
             else:
                 print(f"❌ Forecast API error {response.status_code}. Using mock.")
-                return mock_forecast
 
         except httpx.RequestError as e:
+            self.breaker.record_failure()
             print(f"❌ Forecast API connection failed: {e}. Using mock.")
-            return mock_forecast
+        except asyncio.CancelledError:
+            if response is None:
+                self.breaker.release_probe()
+            raise
         except Exception as e:
+            if response is None:
+                self.breaker.record_failure()
             print(f"❌ Unexpected error in forecast service: {e}. Using mock.")
-            return mock_forecast
+        
+        fallback = self._fallback("forecast", location, stored)
+        self._cache_failure("forecast", self.forecast_cache, location, fallback)
+        return fallback
+
+    async def prefetch(self, cities: Iterable[str], ahead_seconds: float, concurrency: int,
+                       spacing_seconds: float, include_forecast: bool = True) -> int:
+        """
+        Refresh cached weather for the given locations before it expires.
+        Locations are deduplicated by cache key; at most `concurrency`
+        refreshes run at once and starts are spaced to respect provider
+        rate limits. Returns the number of locations refreshed.
+        """
+        if not self.api_key:
+            return 0
+        keys = {self._location_key(city, None, None) for city in cities}
+        
+        def due(kind: str, cache: StaleWhileRevalidateCache, key: str) -> bool:
+            # Keys whose last refresh failed wait out their back-off
+            return cache.fresh_for(key) < ahead_seconds and self._backoff.peek((kind, key)) is None
+        
+        due_keys = [
+            key for key in sorted(keys)
+            if due("current", self.cache, key) or (include_forecast and due("forecast", self.forecast_cache, key))
+        ]
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def refresh(key: str):
+            # One provider request per slot at a time
+            async with semaphore:
+                if due("current", self.cache, key):
+                    await self._single_flight(
+                        ("current", key),
+                        lambda: self._fetch_current(key, self._query_params(key), ahead_seconds)
+                    )
+                if include_forecast and due("forecast", self.forecast_cache, key):
+                    await self._single_flight(
+                        ("forecast", key),
+                        lambda: self._fetch_forecast(key, self._query_params(key), ahead_seconds)
+                    )
+        
+        tasks = []
+        for i, key in enumerate(due_keys):
+            if i:
+                await asyncio.sleep(spacing_seconds)
+            tasks.append(asyncio.create_task(refresh(key)))
+        await asyncio.gather(*tasks)
+        return len(due_keys)
+
+    def stats(self) -> Dict[str, Any]:
+        """Provider call and cache metrics"""
+        return {
+            "provider_calls": self.provider_calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+            "revalidations": self.revalidations,
+            "negative_cached": self.negative_cached,
+            "backed_off": self.backed_off,
+            "cache": self.cache.stats(),
+            "forecast_cache": self.forecast_cache.stats(),
+            "store": self.store.stats(),
+            "last_good": len(self.last_good),
+            "breaker": self.breaker.stats()
+        }
 
 # Global instance
 weather_service = WeatherService()
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Tuple
+from dotenv import load_dotenv
+from app.database import get_database
+
+load_dotenv()
+
+class WeatherStore:
+    """
+    Second-tier weather cache shared by workers and kept across restarts.
+
+    WeatherService consults it after its in-memory cache and writes every
+    provider result to it. Entries carry the time they stop being fresh and
+    the time they may no longer be served at all (end of the stale window).
+    This base class is the disabled store.
+    """
+    backend = "none"
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+
+    async def setup(self):
+        pass
+
+    async def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """(data, fresh_until epoch seconds) for a servable entry, or None"""
+        return None
+
+    async def set(self, key: str, data: Any, fresh_seconds: float, stale_seconds: float):
+        pass
+
+    async def close(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "errors": self.errors
+        }
+
+
+class MongoWeatherStore(WeatherStore):
+    """Entries in the weather_cache collection, removed by a TTL index"""
+    backend = "mongo"
+
+    async def setup(self):
+        db = get_database()
+        await db.weather_cache.create_index("expires_at", expireAfterSeconds=0)
+
+    async def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        db = get_database()
+        doc = await db.weather_cache.find_one({"_id": key})
+        # The TTL monitor only runs once a minute - check expiry ourselves
+        if doc is None or doc["expires_at"] <= datetime.utcnow():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return doc["data"], doc["fresh_until"]
+
+    async def set(self, key: str, data: Any, fresh_seconds: float, stale_seconds: float):
+        db = get_database()
+        now = datetime.utcnow()
+        await db.weather_cache.replace_one(
+            {"_id": key},
+            {
+                "data": data,
+                "fresh_until": time.time() + fresh_seconds,
+                "expires_at": now + timedelta(seconds=fresh_seconds + stale_seconds)
+            },
+            upsert=True
+        )
+        self.writes += 1
+
+
+class DiskWeatherStore(WeatherStore):
+    """
+    Entries in a local SQLite file for single-host deployments. Every
+    worker on the host opens the same file; queries run in a thread so
+    the event loop never blocks on disk.
+    """
+    backend = "disk"
+    CLEANUP_EVERY = 500
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS weather_cache ("
+                "key TEXT PRIMARY KEY, data TEXT NOT NULL, fresh_until REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+        return self._conn
+
+    async def setup(self):
+        await asyncio.to_thread(self._connect)
+
+    def _get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            return self._connect().execute(
+                "SELECT data, fresh_until FROM weather_cache WHERE key = ? AND expires_at > ?",
+                (key, time.time())
+            ).fetchone()
+
+    async def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        row = await asyncio.to_thread(self._get, key)
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0]), row[1]
+
+    def _set(self, key: str, data: str, fresh_until: float, expires_at: float, cleanup: bool):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO weather_cache (key, data, fresh_until, expires_at) VALUES (?, ?, ?, ?)",
+                (key, data, fresh_until, expires_at)
+            )
+            if cleanup:
+                conn.execute("DELETE FROM weather_cache WHERE expires_at <= ?", (time.time(),))
+
+    async def set(self, key: str, data: Any, fresh_seconds: float, stale_seconds: float):
+        now = time.time()
+        self.writes += 1
+        await asyncio.to_thread(
+            self._set, key, json.dumps(data), now + fresh_seconds, now + fresh_seconds + stale_seconds,
+            self.writes % self.CLEANUP_EVERY == 0
+        )
+
+    async def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def create_weather_store() -> WeatherStore:
+    """Build the configured second-tier weather store"""
+    backend = os.getenv("WEATHER_STORE_BACKEND", "none").lower()
+    if backend == "mongo":
+        return MongoWeatherStore()
+    if backend == "disk":
+        return DiskWeatherStore(os.getenv("WEATHER_STORE_PATH", "weather_cache.db"))
+    return WeatherStore()
@@ -0,0 +1,47 @@
+"""
+Rate Limiter Benchmark
+Per-request overhead of the in-memory token-bucket limiter
+(app.rate_limit.InMemoryRateLimiter): many checks spread over many keys,
+all allowed, then one hot key that is mostly limited (429 raised).
+Run from the backend directory: python benchmark_rate_limit.py [checks] [keys]
+"""
+import asyncio
+import sys
+import time
+from fastapi import HTTPException
+from app.rate_limit import InMemoryRateLimiter, RateLimitRule
+
+async def allowed(limiter: InMemoryRateLimiter, checks: int, keys: int) -> float:
+    key_names = [f"device-{i}" for i in range(keys)]
+    started = time.perf_counter()
+    for i in range(checks):
+        await limiter.check("bench", key_names[i % keys])
+    return time.perf_counter() - started
+
+async def limited(limiter: InMemoryRateLimiter, checks: int) -> float:
+    started = time.perf_counter()
+    for _ in range(checks):
+        try:
+            await limiter.check("hot", "device-0")
+        except HTTPException:
+            pass
+    return time.perf_counter() - started
+
+async def main():
+    checks = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    keys = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    limiter = InMemoryRateLimiter({
+        # Generous enough that every check in the first run is allowed
+        "bench": RateLimitRule(rate_per_second=1e6, burst=1e6),
+        "hot": RateLimitRule(rate_per_second=1, burst=10),
+    }, prune_interval=60)
+
+    elapsed = await allowed(limiter, checks, keys)
+    print(f"allowed  {checks} checks over {keys} keys   {elapsed / checks * 1e6:6.2f} us per check")
+    elapsed = await limited(limiter, checks)
+    print(f"limited  {checks} checks on one key       {elapsed / checks * 1e6:6.2f} us per check")
+    stats = limiter.stats()
+    print(f"allowed {dict(stats['allowed'])}   limited {dict(stats['limited'])}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+"""
+List Serialization Benchmark
+Encodes a 10,000-row reading history the way the routes used to (one
+SensorReading model per document, FastAPI response_model validation,
+JSONResponse) and the way they do now (app.serialization with orjson,
+rows and columnar). Reports best-of-N time and payload size.
+Run from the backend directory: python benchmark_serialization.py [rows]
+"""
+import asyncio
+import gzip
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from app.models import SensorReading
+from app.serialization import READING_FIELDS, reading_rows, list_response
+
+def make_docs(n: int) -> List[dict]:
+    """Projected sensor_readings documents as Motor returns them"""
+    start = datetime(2026, 1, 1)
+    return [
+        {
+            "_id": ObjectId(),
+            "device_id": "65a1f0c2e4b0a1b2c3d4e5f6",
+            "soil_moisture": 20 + (i % 600) / 10,
+            "temperature": 18.5 + (i % 120) / 10,
+            "humidity": 40 + i % 50,
+            "rain_sensor": i % 7 == 0,
+            "timestamp": start + timedelta(minutes=5 * i)
+        }
+        for i in range(n)
+    ]
+
+RESPONSE_FIELD = create_response_field(name="Response", type_=List[SensorReading])
+
+async def before(docs: List[dict]) -> bytes:
+    """Previous route body: models, then response_model validation and JSONResponse"""
+    readings = [
+        SensorReading(
+            id=str(r["_id"]),
+            device_id=r["device_id"],
+            soil_moisture=r.get("soil_moisture", 0.0),
+            temperature=r.get("temperature", 25.0),
+            humidity=r.get("humidity", 50.0),
+            rain_sensor=r.get("rain_sensor", 0),
+            timestamp=r["timestamp"]
+        )
+        for r in docs
+    ]
+    content = await serialize_response(field=RESPONSE_FIELD, response_content=readings)
+    return JSONResponse(content).body
+
+async def orjson_rows(docs: List[dict]) -> bytes:
+    return list_response(reading_rows(docs), READING_FIELDS, "rows").body
+
+async def orjson_columnar(docs: List[dict]) -> bytes:
+    return list_response(reading_rows(docs), READING_FIELDS, "columnar").body
+
+async def best_of(encode, docs: List[dict], runs: int = 10):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        body = await encode(docs)
+        timings.append(time.perf_counter() - started)
+    return min(timings), body
+
+async def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    docs = make_docs(n)
+    print(f"{n} rows, best of 10")
+    bodies = {}
+    for name, encode in (("before", before), ("orjson rows", orjson_rows), ("orjson columnar", orjson_columnar)):
+        elapsed, body = await best_of(encode, docs)
+        bodies[name] = body
+        print(
+            f"  {name:16s} {elapsed * 1000:7.1f} ms   {len(body) / 1024:6.0f} KiB   "
+            f"(gzip {len(gzip.compress(body)) / 1024:4.0f} KiB)"
+        )
+    same = json.loads(bodies["before"]) == json.loads(bodies["orjson rows"])
+    print(f"  rows decode to the same JSON as before: {same}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
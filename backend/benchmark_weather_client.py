@@ -0,0 +1,134 @@
+"""
+Weather Client Benchmark
+Runs a local keep-alive stub of the OpenWeather /weather endpoint and
+compares a new httpx.AsyncClient per request with the pooled client of
+app.weather_service: sequential miss latency, then a burst of concurrent
+misses (sockets opened and open at once, throughput, failures).
+Run from the backend directory: python benchmark_weather_client.py [burst]
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Optional
+
+# The service reads its settings at import time; point it at the stub
+STUB_PORT = int(os.getenv("STUB_PROVIDER_PORT", 8765))
+os.environ["OPENWEATHER_API_KEY"] = "stub-key"
+os.environ["OPENWEATHER_BASE_URL"] = f"http://127.0.0.1:{STUB_PORT}"
+os.environ["WEATHER_STORE_BACKEND"] = "none"
+
+import httpx
+from app.weather_service import weather_service
+
+class StubProvider:
+    """
+    Minimal HTTP/1.1 server answering every GET with a fixed current-weather
+    payload after `delay` seconds; counts requests, sockets and concurrency
+    """
+    BODY = json.dumps({
+        "name": "Stubville",
+        "main": {"temp": 21.5, "feels_like": 21.0, "humidity": 55},
+        "weather": [{"description": "scattered clouds"}],
+        "clouds": {"all": 40}
+    }).encode()
+
+    def __init__(self, port: int = STUB_PORT, delay: float = 0.0):
+        self.port = port
+        self.delay = delay
+        self.requests = 0
+        self.connections = 0
+        self.open_connections = 0
+        self.peak_open_connections = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def reset(self):
+        self.requests = self.connections = self.peak_open_connections = 0
+        self.in_flight = self.peak_in_flight = 0
+
+    async def __aenter__(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", self.port, backlog=1024)
+        return self
+
+    async def __aexit__(self, *exc):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        self.open_connections += 1
+        self.peak_open_connections = max(self.peak_open_connections, self.open_connections)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                if not head:
+                    break
+                self.requests += 1
+                self.in_flight += 1
+                self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+                try:
+                    if self.delay:
+                        await asyncio.sleep(self.delay)
+                finally:
+                    self.in_flight -= 1
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: " + str(len(self.BODY)).encode() + b"\r\n"
+                    b"Connection: keep-alive\r\n\r\n" + self.BODY
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.open_connections -= 1
+            writer.close()
+
+PARAMS = {"q": "stubville", "appid": "stub-key", "units": "metric"}
+
+async def per_request_get():
+    """The old pattern: one client (and connection) per provider call"""
+    async with httpx.AsyncClient(base_url=weather_service.base_url, timeout=weather_service.timeout) as client:
+        response = await client.get("/weather", params=PARAMS)
+        response.json()
+
+async def pooled_get():
+    response = await weather_service._get("/weather", PARAMS)
+    response.json()
+
+async def sequential(stub: StubProvider, name: str, call, n: int = 200):
+    await call()  # warm up (pooled: opens the connection)
+    stub.reset()
+    started = time.perf_counter()
+    for _ in range(n):
+        await call()
+    elapsed = time.perf_counter() - started
+    print(f"  {name:12s} {elapsed / n * 1000:7.2f} ms per miss   sockets opened {stub.connections}")
+
+async def burst(stub: StubProvider, name: str, call, n: int):
+    stub.reset()
+    started = time.perf_counter()
+    results = await asyncio.gather(*(call() for _ in range(n)), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    failures = sum(isinstance(r, Exception) for r in results)
+    print(
+        f"  {name:12s} {n / elapsed:7.0f} req/s   sockets opened {stub.connections:4d}   "
+        f"peak open {stub.peak_open_connections:4d}   failures {failures}"
+    )
+
+async def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    async with StubProvider() as stub:
+        await weather_service.start()
+        print("Sequential misses")
+        await sequential(stub, "per-request", per_request_get)
+        await sequential(stub, "pooled", pooled_get)
+        print(f"{n} concurrent misses (pool limit {weather_service.limits.max_connections} connections)")
+        await burst(stub, "per-request", per_request_get, n)
+        await burst(stub, "pooled", pooled_get, n)
+        await weather_service.stop()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+"""
+Weather Fan-out Benchmark
+Fleet-style lookup of 600 location names covering 200 places (spelling
+variants of each) against the local stub provider with 100 ms latency:
+a sequential loop, an unbounded gather of get_current_weather, and
+get_current_weather_many at two concurrency limits. Then 100 stale
+entries are read at once to show the bound on background refreshes.
+Run from the backend directory: python benchmark_weather_many.py
+"""
+import asyncio
+import contextlib
+import io
+import time
+
+# Importing the stub first points the weather service at it
+from benchmark_weather_client import StubProvider
+from app.weather_service import weather_service
+
+PLACES = 200
+NAMES = [
+    variant.format(f"Place{i}")
+    for i in range(PLACES)
+    for variant in ("{}", "{} ".upper(), " {}".lower())
+]
+
+def reset_caches():
+    weather_service.cache.clear()
+    weather_service.last_good.clear()
+    weather_service._backoff.clear()
+
+async def sequential_loop():
+    for name in NAMES:
+        await weather_service.get_current_weather(city=name)
+
+async def unbounded_gather():
+    await asyncio.gather(*(weather_service.get_current_weather(city=name) for name in NAMES))
+
+def many(concurrency: int):
+    async def run():
+        await weather_service.get_current_weather_many(NAMES, concurrency=concurrency)
+    return run
+
+async def timed(stub: StubProvider, name: str, run):
+    reset_caches()
+    stub.reset()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        await run()
+    elapsed = time.perf_counter() - started
+    print(
+        f"  {name:26s} {elapsed:6.2f} s   provider calls {stub.requests:4d}   "
+        f"peak concurrent {stub.peak_in_flight:3d}"
+    )
+
+async def stale_revalidation(stub: StubProvider, n: int = 100):
+    reset_caches()
+    with contextlib.redirect_stdout(io.StringIO()):
+        await weather_service.get_current_weather_many(NAMES[:3 * n:3])
+        # Expire every entry but keep it servable (stale-while-revalidate)
+        for key in list(weather_service.cache._entries):
+            weather_service.cache.set(key, weather_service.cache.peek(key), 0)
+        stub.reset()
+        started = time.perf_counter()
+        await weather_service.get_current_weather_many(NAMES[:3 * n:3])
+        served = time.perf_counter() - started
+        while stub.requests < n or stub.in_flight:
+            await asyncio.sleep(0.01)
+    print(
+        f"  {n} stale entries served in {served * 1000:.1f} ms; background refreshes "
+        f"{stub.requests}, peak concurrent {stub.peak_in_flight}"
+    )
+
+async def main():
+    async with StubProvider(delay=0.1) as stub:
+        await weather_service.start()
+        print(f"{len(NAMES)} names, {PLACES} places, 100 ms provider latency")
+        await timed(stub, "sequential loop", sequential_loop)
+        await timed(stub, "unbounded gather", unbounded_gather)
+        await timed(stub, "many, concurrency 8", many(8))
+        await timed(stub, "many, concurrency 20", many(20))
+
+        stub.reset()
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            await many(8)()
+        print(f"  {'warm repeat':26s} {(time.perf_counter() - started) * 1000:6.1f} ms  provider calls {stub.requests:4d}")
+
+        print("Stale entries")
+        await stale_revalidation(stub)
+        await weather_service.stop()
+
+if __name__ == "__main__":
+    asyncio.run(main())
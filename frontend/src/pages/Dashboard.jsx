@@ -2,7 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { Droplet, Thermometer, Cloud, CloudRain, Power, RefreshCw, AlertCircle } from 'lucide-react';
 import Card from '../components/Card';
 import Button from '../components/Button';
-import api from '../utils/api';
+import api, { pumpStatusSocketUrl } from '../utils/api';
 import toast from 'react-hot-toast';
 
 const Dashboard = () => {
@@ -25,11 +25,30 @@ const Dashboard = () => {
 
     useEffect(() => {
         if (autoRefresh && selectedDevice) {
-            const interval = setInterval(fetchData, 10000); // 10 seconds
+            const interval = setInterval(fetchSensorData, 10000); // 10 seconds
             return () => clearInterval(interval);
         }
     }, [autoRefresh, selectedDevice]);
 
+    // Pump status is pushed by the server instead of polled
+    useEffect(() => {
+        if (!selectedDevice) return;
+
+        const socket = new WebSocket(pumpStatusSocketUrl(selectedDevice));
+        socket.onmessage = (event) => {
+            const message = JSON.parse(event.data);
+            if (message.type === 'pump_status' && message.device_id === selectedDevice) {
+                setPumpStatus({
+                    device_id: message.device_id,
+                    status: message.status,
+                    mode: message.mode,
+                    last_updated: message.last_updated,
+                });
+            }
+        };
+        return () => socket.close();
+    }, [selectedDevice]);
+
     const fetchDevices = async () => {
         try {
             const response = await api.get('/api/devices');
@@ -45,7 +64,7 @@ const Dashboard = () => {
         }
     };
 
-    const fetchData = async () => {
+    const fetchSensorData = async () => {
         if (!selectedDevice) return;
 
         try {
@@ -57,8 +76,18 @@ const Dashboard = () => {
             if (sensorResponse.data.length > 0) {
                 setSensorData(sensorResponse.data[0]);
             }
+        } catch (error) {
+            console.error('Failed to fetch sensor data:', error);
+        }
+    };
+
+    const fetchData = async () => {
+        if (!selectedDevice) return;
+
+        try {
+            await fetchSensorData();
 
-            // Fetch pump status
+            // Fetch initial pump status (updates arrive over the WebSocket)
             const pumpResponse = await api.get(`/api/pump/status/${selectedDevice}`);
             setPumpStatus(pumpResponse.data);
 
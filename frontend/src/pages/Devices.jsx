@@ -9,6 +9,8 @@ import toast from 'react-hot-toast';
 const Devices = () => {
     const [devices, setDevices] = useState([]);
     const [loading, setLoading] = useState(true);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [showModal, setShowModal] = useState(false);
     const [editingDevice, setEditingDevice] = useState(null);
     const [formData, setFormData] = useState({
@@ -26,6 +28,7 @@ const Devices = () => {
         try {
             const response = await api.get('/api/devices');
             setDevices(response.data);
+            setNextCursor(response.headers['x-next-cursor'] || null);
         } catch (error) {
             toast.error('Failed to fetch devices');
         } finally {
@@ -33,6 +36,20 @@ const Devices = () => {
         }
     };
 
+    // The device list is paginated; X-Next-Cursor is set while more pages exist
+    const loadMoreDevices = async () => {
+        setLoadingMore(true);
+        try {
+            const response = await api.get('/api/devices', { params: { after: nextCursor } });
+            setDevices((current) => [...current, ...response.data]);
+            setNextCursor(response.headers['x-next-cursor'] || null);
+        } catch (error) {
+            toast.error('Failed to fetch more devices');
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     const handleSubmit = async (e) => {
         e.preventDefault();
 
@@ -212,6 +229,14 @@ const Devices = () => {
                 </Card>
             )}
 
+            {!loading && nextCursor && (
+                <div className="flex justify-center">
+                    <Button onClick={loadMoreDevices} variant="outline" loading={loadingMore}>
+                        Load more devices
+                    </Button>
+                </div>
+            )}
+
             {/* Add/Edit Modal */}
             {showModal && (
                 <div className="fixed inset-0 bg-black/50 flex items-center justify-center z-50 p-4">
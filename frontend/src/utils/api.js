@@ -52,4 +52,15 @@ api.interceptors.response.use(
     }
 );
 
+// WebSocket URL for pushed pump status updates
+export const pumpStatusSocketUrl = (deviceId) => {
+    const url = new URL('/api/pump/ws', API_URL);
+    url.protocol = url.protocol === 'https:' ? 'wss:' : 'ws:';
+    url.searchParams.set('token', localStorage.getItem('token') || '');
+    if (deviceId) {
+        url.searchParams.set('device_id', deviceId);
+    }
+    return url.toString();
+};
+
 export default api;